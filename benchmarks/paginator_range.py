@@ -0,0 +1,105 @@
+"""Размер и время рендера паджинатора: полный список страниц и окно.
+
+Запуск из корня репозитория:
+
+    python benchmarks/paginator_range.py --posts 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+# Прежний includes/paginator.html: по ссылке на каждую страницу.
+FULL_RANGE_TEMPLATE = '''
+<ul class="pagination">
+{% for i in page_obj.paginator.page_range %}
+  {% if page_obj.number == i %}
+    <li class="page-item active"><span class="page-link">{{ i }}</span></li>
+  {% else %}
+    <li class="page-item">
+      <a class="page-link" href="?page={{ i }}">{{ i }}</a>
+    </li>
+  {% endif %}
+{% endfor %}
+</ul>
+'''
+
+
+def setup(database):
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    settings.TASKS_ALWAYS_EAGER = True
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(posts):
+    from posts.models import Post, User
+
+    author = User.objects.create_user(username='bench')
+    Post.objects.bulk_create(
+        Post(author=author, text=f'Пост {i}') for i in range(posts)
+    )
+
+
+def measure(render, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        html = render()
+    return len(html.encode()), (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--page', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup(os.path.join(directory, 'bench.sqlite3'))
+        seed(args.posts)
+
+        from django.core.cache import cache
+        from django.template import Context, Template
+        from django.template.loader import get_template
+        from django.test import Client, RequestFactory
+        from posts.models import Post
+        from posts.utils import get_page_context
+
+        request = RequestFactory().get('/', {'page': args.page})
+        page_obj = get_page_context(Post.objects.for_feed(), request)
+        context = {'page_obj': page_obj}
+        full = Template(FULL_RANGE_TEMPLATE)
+        elided = get_template('includes/paginator.html')
+        results = (
+            ('весь диапазон', measure(
+                lambda: full.render(Context(context)), args.repeat)),
+            ('окно страниц', measure(
+                lambda: elided.render(context), args.repeat)),
+        )
+        print(f'Постов: {args.posts}, страниц: '
+              f'{page_obj.paginator.num_pages}, текущая: {page_obj.number}')
+        for name, (size, seconds) in results:
+            print(f'{name:>15}: {size:>9} байт, {seconds * 1000:8.2f} мс')
+
+        client = Client()
+
+        def index():
+            cache.clear()
+            return client.get('/', {'page': args.page}).content.decode()
+
+        size, seconds = measure(index, args.repeat)
+        print(f'{"главная":>15}: {size:>9} байт, {seconds * 1000:8.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Пиковая память при параллельной загрузке больших картинок в PostForm.
+
+Каждый режим запускается в отдельном процессе, который разбирает
+--uploads параллельных multipart-запросов с одной картинкой, проверяет
+PostForm и сохраняет принятый пост, как view post_create. Фоновые
+задачи (превью, очистка метаданных) ставятся в очередь и не
+выполняются:
+
+- default: обработчики загрузки Django и ImageField без пределов;
+- limited: LimitedTemporaryFileUploadHandler и пределы PostForm.
+
+Тело запроса читается из файла на диске, как из сокета. Запуск из
+корня репозитория:
+
+    python benchmarks/upload_memory.py --size 20 --uploads 8
+    python benchmarks/upload_memory.py --size 20 --max-mb 32
+    python benchmarks/upload_memory.py --bomb 100
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+BOUNDARY = 'BenchmarkBoundary'
+DEFAULT_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+
+def noise_png(megabytes):
+    """PNG из случайных пикселей: почти не сжимается."""
+    from PIL import Image
+
+    side = int((megabytes * 2 ** 20 / 3) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    content = io.BytesIO()
+    image.save(content, 'PNG', compress_level=1)
+    return content.getvalue()
+
+
+def bomb_png(pixels):
+    """Маленький PNG, который при декодировании займет pixels * 3 байт."""
+    from PIL import Image
+
+    side = int(pixels ** 0.5)
+    content = io.BytesIO()
+    Image.new('1', (side, side)).save(content, 'PNG')
+    return content.getvalue()
+
+
+def write_body(path, image):
+    from django.test.client import encode_multipart
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    body = encode_multipart(BOUNDARY, {
+        'text': 'Пост с большой картинкой',
+        'image': SimpleUploadedFile('large.png', image, 'image/png'),
+    })
+    with open(path, 'wb') as file:
+        file.write(body)
+    return len(body)
+
+
+def max_rss():
+    """Пиковый RSS процесса в МБ.
+
+    ru_maxrss в Linux наследуется от родителя через fork и exec, поэтому
+    сначала берется VmHWM из /proc.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, body, uploads, max_mb):
+    import django
+    from django.conf import settings
+
+    # Файл, а не :memory:: у каждого потока свое соединение.
+    directory = os.path.dirname(body)
+    settings.DATABASES['default']['NAME'] = os.path.join(
+        directory, f'{mode}.sqlite3')
+    settings.MEDIA_ROOT = os.path.join(directory, f'media-{mode}')
+    settings.TASKS_ALWAYS_EAGER = False
+    settings.METRICS_ENABLED = False
+    if max_mb:
+        settings.POST_IMAGE_MAX_BYTES = max_mb * 2 ** 20
+    if mode == 'default':
+        settings.FILE_UPLOAD_HANDLERS = DEFAULT_HANDLERS
+    django.setup()
+    from django import forms
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.core.management import call_command
+    from django.db import connection
+    from posts.forms import PostForm
+    from posts.models import Post, User
+
+    call_command('migrate', verbosity=0)
+    author = User.objects.create_user(username='benchmark')
+    connection.close()
+
+    class DefaultPostForm(forms.ModelForm):
+        class Meta:
+            model = Post
+            fields = ['text', 'group', 'image']
+
+    form_class = PostForm if mode == 'limited' else DefaultPostForm
+    accepted = []
+
+    def upload():
+        with open(body, 'rb') as stream:
+            request = WSGIRequest({
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': '/create/',
+                'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+                'CONTENT_LENGTH': str(os.path.getsize(body)),
+                'wsgi.input': stream,
+            })
+            form = form_class(request.POST, request.FILES)
+            valid = form.is_valid()
+            if valid:
+                form.instance.author = author
+                form.save()
+            accepted.append(valid)
+            # Как по окончании запроса: файлы закрывает обработчик.
+            request.close()
+        connection.close()
+
+    baseline = max_rss()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=upload) for _ in range(uploads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    print(f'{mode:>8}: принято {sum(accepted)}/{uploads}, '
+          f'пик RSS {max_rss():7.1f} МБ (после запуска {baseline:6.1f}), '
+          f'{seconds * 1000:7.0f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=20, help='МБ')
+    parser.add_argument('--uploads', type=int, default=8)
+    parser.add_argument(
+        '--bomb', type=int, default=0,
+        help='Вместо шума - PNG на столько миллионов пикселей.')
+    parser.add_argument(
+        '--max-mb', type=int, default=0,
+        help='POST_IMAGE_MAX_BYTES в МБ для режима limited.')
+    parser.add_argument('--child', choices=('default', 'limited'))
+    parser.add_argument('--body')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.body, args.uploads, args.max_mb)
+        return
+
+    import django
+    django.setup()
+    if args.bomb:
+        image = bomb_png(args.bomb * 10 ** 6)
+    else:
+        image = noise_png(args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        body = os.path.join(directory, 'body')
+        size = write_body(body, image)
+        print(f'Тело запроса: {size / 2 ** 20:.1f} МБ, '
+              f'загрузок: {args.uploads}')
+        for mode in ('default', 'limited'):
+            subprocess.run([
+                sys.executable, __file__, '--child', mode, '--body', body,
+                '--uploads', str(args.uploads), '--max-mb', str(args.max_mb),
+            ], check=True)
+
+
+if __name__ == '__main__':
+    main()
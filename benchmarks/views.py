@@ -0,0 +1,345 @@
+"""Время, SQL-запросы и память view постов на большом наборе данных.
+
+Скрипт заполняет базу синтетическими пользователями, группами,
+постами, подписками и комментариями. Авторы, группы и посты выбираются
+с перекосом, как в жизни: у первых пользователей больше всего постов и
+подписчиков. Затем каждый view вызывается через тестовый клиент на
+первой и на глубокой странице. Для каждого случая считаются p50 и p95
+времени ответа, число SQL-запросов и пик памяти Python (tracemalloc,
+отдельным запросом). Результаты пишутся в JSON; --compare печатает
+разницу p50 с прошлым запуском. Имена случаев не зависят от данных:
+номер страницы и число комментариев пишутся в JSON отдельно. POST
+выполняются в транзакции с откатом, поэтому база не меняется.
+
+Заполнение миллионов строк занимает минуты, поэтому базу можно
+сохранить и переиспользовать через --database. Запуск из корня
+репозитория:
+
+    python benchmarks/views.py --users 100000 --posts 1000000 \\
+        --follows 5000000 --comments 5000000 --database /tmp/bench.sqlite3 \\
+        --output before.json
+    python benchmarks/views.py --database /tmp/bench.sqlite3 \\
+        --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+BATCH_SIZE = 10000
+# Пользователь тестового клиента и читатель ленты подписок.
+READER = 'user0'
+
+
+def setup(database):
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    settings.TASKS_ALWAYS_EAGER = True
+    # Замеры не должны мерить сами себя.
+    settings.METRICS_ENABLED = False
+    settings.REQUEST_TIMING_SAMPLE_RATE = 0
+    settings.SLOW_QUERY_THRESHOLD = None
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def skewed(rng, n):
+    """Случайное число от 0 до n - 1, чаще маленькое."""
+    return int(n * rng.random() ** 3)
+
+
+def insert(model, rows, date_field=None):
+    """bulk_create пачками по BATCH_SIZE, каждая в своей транзакции.
+
+    С date_field сохраняются даты строк, как при импорте.
+    """
+    from django.db import transaction
+    from posts.importer import bulk_create_dated
+    from posts.timeline import chunked
+
+    total = 0
+    for batch in chunked(rows, BATCH_SIZE):
+        if date_field:
+            bulk_create_dated(model, batch, date_field)
+        else:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def seed(args):
+    from django.db import connection
+    from django.utils import timezone
+    from posts import stats, timeline
+    from posts.models import Comment, Follow, Group, Post, User
+
+    rng = random.Random(args.seed)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous = OFF')
+    start = timezone.now() - datetime.timedelta(days=365)
+    step = datetime.timedelta(days=365) / max(args.posts, 1)
+
+    def progress(name, count, started):
+        print(f'{name:>12}: {count:>9} за '
+              f'{time.perf_counter() - started:6.1f} с', flush=True)
+
+    started = time.perf_counter()
+    count = insert(User, (
+        User(pk=i + 1, username=f'user{i}', password='!',
+             first_name='Имя', last_name=f'Фамилия {i}')
+        for i in range(args.users)))
+    progress('пользователи', count, started)
+
+    started = time.perf_counter()
+    count = insert(Group, (
+        Group(pk=i + 1, slug=f'group{i}', title=f'Группа {i}',
+              description='Описание')
+        for i in range(args.groups)))
+    progress('группы', count, started)
+
+    started = time.perf_counter()
+    count = insert(Post, (
+        Post(pk=i + 1, author_id=skewed(rng, args.users) + 1,
+             group_id=(skewed(rng, args.groups) + 1
+                       if rng.random() < 0.7 else None),
+             text=f'Пост {i} ' + 'текст ' * rng.randrange(5, 60),
+             pub_date=start + step * i)
+        for i in range(args.posts)), 'pub_date')
+    progress('посты', count, started)
+
+    def follows():
+        per_user = args.follows // max(args.users, 1)
+        for user in range(args.users):
+            # Подписок не больше, чем других пользователей.
+            wanted = min(per_user, args.users - 1)
+            authors = set()
+            for _ in range(wanted * 10):
+                if len(authors) == wanted:
+                    break
+                authors.add(skewed(rng, args.users))
+            authors.discard(user)
+            rest = [
+                author for author in range(args.users)
+                if author != user and author not in authors
+            ] if len(authors) < wanted else ()
+            authors.update(rng.sample(rest, wanted - len(authors)))
+            for author in authors:
+                yield Follow(user_id=user + 1, author_id=author + 1)
+
+    started = time.perf_counter()
+    count = insert(Follow, follows())
+    progress('подписки', count, started)
+
+    started = time.perf_counter()
+    count = insert(Comment, (
+        Comment(post_id=args.posts - skewed(rng, args.posts),
+                author_id=rng.randrange(args.users) + 1,
+                text=f'Комментарий {i}',
+                created=start + step * rng.randrange(args.posts))
+        for i in range(args.comments)), 'created')
+    progress('комментарии', count, started)
+
+    # Лента материализуется только для читателя: полная пересборка
+    # для всех подписок заняла бы больше места, чем остальные данные.
+    started = time.perf_counter()
+    reader = User.objects.get(username=READER)
+    for author_id in reader.follower.values_list('author_id', flat=True):
+        timeline.backfill(reader.pk, author_id)
+    progress('лента', reader.timeline.count(), started)
+
+    started = time.perf_counter()
+    stats.recount()
+    progress('счетчики', User.objects.count(), started)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+def cases(args):
+    """(view, случай, подробности, метод, URL, данные) каждого замера."""
+    from django.conf import settings
+    from django.db.models import Count
+    from django.urls import reverse
+    from posts.models import Group, Post, User
+
+    reader = User.objects.get(username=READER)
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total').first()
+    author = User.objects.order_by('-stats__posts_count').first()
+    latest = Post.objects.filter(comments__isnull=True).order_by(
+        '-pub_date').first() or Post.objects.order_by('-pub_date').first()
+    commented = Post.objects.annotate(total=Count('comments')).order_by(
+        '-total').first()
+
+    def last_page(count):
+        return args.deep_page or max(
+            1, -(-count // settings.POSTS_PER_PAGE))
+
+    feeds = (
+        ('index', reverse('posts:index'), Post.objects.count()),
+        ('group_posts', reverse('posts:group_list', args=[group.slug]),
+         group.total),
+        ('profile', reverse('posts:profile', args=[author.username]),
+         author.stats.posts_count),
+        ('follow_index', reverse('posts:follow_index'),
+         reader.timeline.count()),
+    )
+    for name, url, count in feeds:
+        yield name, 'первая', {'page': 1}, 'get', url, {'page': 1}
+        page = last_page(count)
+        yield name, 'глубокая', {'page': page}, 'get', url, {'page': page}
+    yield ('post_detail', 'без комм.', {'comments': 0}, 'get',
+           reverse('posts:post_detail', args=[latest.pk]), None)
+    yield ('post_detail', 'много комм.', {'comments': commented.total},
+           'get', reverse('posts:post_detail', args=[commented.pk]), None)
+    yield ('add_comment', 'комментарий', {}, 'post',
+           reverse('posts:add_comment', args=[commented.pk]),
+           {'text': 'Комментарий замера'})
+    yield ('post_create', 'пост', {}, 'post', reverse('posts:post_create'),
+           {'text': 'Пост замера', 'group': group.pk})
+
+
+def run(args):
+    from django.core.cache import cache
+    from django.db import connection, transaction
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from posts.models import User
+
+    client = Client()
+    client.force_login(User.objects.get(username=READER))
+    results = []
+    for view, case, details, method, url, data in cases(args):
+
+        def request(url, data, method=method):
+            if method == 'get':
+                return client.get(url, data)
+            # Замер не должен менять базу, которую переиспользуют.
+            with transaction.atomic():
+                response = client.post(url, data)
+                transaction.set_rollback(True)
+            return response
+
+        timings = []
+        queries = status = None
+        for _ in range(args.repeat):
+            if not args.warm:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request(url, data)
+                timings.append(time.perf_counter() - started)
+            queries, status = len(captured), response.status_code
+        if not args.warm:
+            cache.clear()
+        tracemalloc.start()
+        request(url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if method == 'post':
+            # Счетчики и версии в кэше помнят откаченные записи.
+            cache.clear()
+        result = {
+            'view': view,
+            'case': case,
+            **details,
+            'url': url,
+            'status': status,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'queries': queries,
+            'peak_kb': round(peak / 1024),
+        }
+        results.append(result)
+        print(f'{view:>13} {case:>14}: p50 {result["p50_ms"]:8.2f} мс, '
+              f'p95 {result["p95_ms"]:8.2f} мс, SQL {queries:3}, '
+              f'пик {result["peak_kb"]:7} КБ, {status}', flush=True)
+    return results
+
+
+def compare(results, path):
+    with open(path, encoding='utf-8') as previous:
+        before = {
+            (result['view'], result['case']): result
+            for result in json.load(previous)['results']}
+    print(f'Разница p50 с {path}:')
+    for result in results:
+        old = before.get((result['view'], result['case']))
+        if old is None or not old['p50_ms']:
+            continue
+        change = (result['p50_ms'] / old['p50_ms'] - 1) * 100
+        print(f'{result["view"]:>13} {result["case"]:>14}: '
+              f'{old["p50_ms"]:8.2f} -> {result["p50_ms"]:8.2f} мс '
+              f'({change:+.0f}%), SQL {old["queries"]} -> '
+              f'{result["queries"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--follows', type=int, default=5000000)
+    parser.add_argument('--comments', type=int, default=5000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--database',
+        help='Файл SQLite; если он уже есть, данные не создаются.')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument(
+        '--deep-page', type=int, default=0,
+        help='Номер глубокой страницы; по умолчанию последняя.')
+    parser.add_argument(
+        '--warm', action='store_true',
+        help='Не сбрасывать кэш между запросами.')
+    parser.add_argument('--output', help='Файл JSON для результатов.')
+    parser.add_argument('--compare', help='JSON прошлого запуска.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = args.database or os.path.join(
+            directory, 'bench.sqlite3')
+        exists = os.path.exists(database)
+        setup(database)
+        if not exists:
+            seed(args)
+        results = run(args)
+
+    import django
+    report = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'args': vars(args),
+        'max_rss_mb': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
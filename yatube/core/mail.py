@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from posts.tasks import run_in_background
+
+
+def send_queued(messages):
+    """Отправляет письма, сохраненные QueuedEmailBackend."""
+    connection = get_connection(settings.QUEUED_EMAIL_BACKEND)
+    connection.send_messages([
+        EmailMultiAlternatives(**message) for message in messages])
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Ставит письма в очередь задач вместо отправки в запросе.
+
+    Вложения не поддерживаются: в проекте их не отправляют.
+    """
+
+    def send_messages(self, email_messages):
+        messages = [
+            {
+                'subject': message.subject,
+                'body': message.body,
+                'from_email': message.from_email,
+                'to': message.to,
+                'cc': message.cc,
+                'bcc': message.bcc,
+                'reply_to': message.reply_to,
+                'headers': message.extra_headers,
+                'alternatives': getattr(message, 'alternatives', []),
+            }
+            for message in email_messages
+        ]
+        if messages:
+            run_in_background(send_queued, messages, queue='mail')
+        return len(messages)
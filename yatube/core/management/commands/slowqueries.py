@@ -0,0 +1,56 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slowqueries import normalize, read_entries
+
+SORTS = ('total', 'count', 'max')
+
+
+class Command(BaseCommand):
+    help = 'Сводка лога медленных запросов по запросам без значений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Файл лога; ротированные копии читаются тоже.')
+        parser.add_argument(
+            '--sort', choices=SORTS, default='total',
+            help='Порядок: суммарное время, число или максимум.')
+        parser.add_argument(
+            '--limit', type=int, default=20, help='Сколько запросов.')
+
+    def handle(self, *args, **options):
+        groups = defaultdict(lambda: {
+            'count': 0, 'total': 0.0, 'max': 0.0,
+            'views': Counter(), 'callers': Counter(), 'plan': None})
+        for entry in read_entries(options['log']):
+            group = groups[normalize(entry['sql'])]
+            group['count'] += 1
+            group['total'] += entry['duration']
+            if entry['duration'] >= group['max']:
+                group['max'] = entry['duration']
+                group['plan'] = entry.get('plan')
+            group['views'][entry.get('view')] += 1
+            group['callers'][entry.get('caller')] += 1
+        if not groups:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        ordered = sorted(
+            groups.items(), key=lambda item: item[1][options['sort']],
+            reverse=True)
+        for statement, group in ordered[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{group["count"]} раз, всего {group["total"]:.1f} мс, '
+                f'в среднем {group["total"] / group["count"]:.1f} мс, '
+                f'максимум {group["max"]:.1f} мс'))
+            self.stdout.write(statement)
+            for title, counter in (('view', group['views']),
+                                   ('код', group['callers'])):
+                common = ', '.join(
+                    f'{name} ({count})'
+                    for name, count in counter.most_common(3))
+                self.stdout.write(f'  {title}: {common}')
+            for line in group['plan'] or ():
+                self.stdout.write(self.style.WARNING(f'  {line}'))
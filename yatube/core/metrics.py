@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.metrics')
+
+# Границы корзин гистограмм: секунды ответа и SQL-запросы на запрос.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, float('inf'))
+
+METRICS = {
+    'yatube_http_requests_total': (
+        'counter', 'Ответы по имени URL и статусу.'),
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'Время ответа по имени URL.'),
+    'yatube_db_queries_per_request': (
+        'histogram', 'SQL-запросы на запрос по имени URL.'),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кэшу страниц и карточек.'),
+}
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS samples (
+        name TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (name, labels)
+    )
+'''
+UPSERT = '''
+    INSERT INTO samples (name, labels, value) VALUES (?, ?, ?)
+    ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value
+'''
+
+
+class Registry:
+    """Метрики процесса, которые периодически сливаются в общий SQLite.
+
+    Каждый процесс копит приращения в памяти, а фоновый поток раз в
+    METRICS_FLUSH_INTERVAL секунд прибавляет их к файлу METRICS_DB,
+    поэтому /metrics/ видит сумму по всем воркерам, а запросы не ждут
+    записи в SQLite. Поток запускается при первой метрике процесса,
+    в том числе после fork.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.pid = None
+
+    def start(self):
+        """Запускает поток записи, если в этом процессе его еще нет."""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, json.dumps(labels, sort_keys=True))
+        with self.lock:
+            self.start()
+            self.values[key] += amount
+
+    def observe(self, name, value, buckets, **labels):
+        with self.lock:
+            self.start()
+            for bound in buckets:
+                if value <= bound:
+                    le = '+Inf' if bound == float('inf') else str(bound)
+                    key = json.dumps({**labels, 'le': le}, sort_keys=True)
+                    self.values[f'{name}_bucket', key] += 1
+            key = json.dumps(labels, sort_keys=True)
+            self.values[f'{name}_sum', key] += value
+            self.values[f'{name}_count', key] += 1
+
+    def flush(self):
+        """Прибавляет накопленное к METRICS_DB.
+
+        Если файл недоступен или занят дольше таймаута, приращения
+        возвращаются в память и уйдут со следующей записью.
+        """
+        with self.lock:
+            values, self.values = self.values, defaultdict(float)
+        if not values:
+            return
+        try:
+            with connect() as db:
+                db.executemany(UPSERT, [
+                    (name, labels, value)
+                    for (name, labels), value in values.items()])
+        except sqlite3.Error:
+            logger.exception('Метрики не записаны в %s', settings.METRICS_DB)
+            with self.lock:
+                for key, value in values.items():
+                    self.values[key] += value
+
+
+def count_cache(cache, hits, misses):
+    """Отмечает попадания и промахи кэша cache ('page' или 'fragment')."""
+    if not settings.METRICS_ENABLED:
+        return
+    if hits:
+        registry.inc('yatube_cache_requests_total', hits,
+                     cache=cache, result='hit')
+    if misses:
+        registry.inc('yatube_cache_requests_total', misses,
+                     cache=cache, result='miss')
+
+
+def connect():
+    db = sqlite3.connect(settings.METRICS_DB, timeout=5)
+    try:
+        db.execute(CREATE_TABLE)
+    except sqlite3.Error:
+        db.close()
+        raise
+    return db
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def sort_key(row):
+    name, labels, value = row
+    labels = json.loads(labels)
+    le = labels.pop('le', None)
+    return name, sorted(labels.items()), float(le) if le else 0
+
+
+def render():
+    """Все метрики из METRICS_DB в текстовом формате Prometheus."""
+    registry.flush()
+    with connect() as db:
+        rows = sorted(db.execute('SELECT name, labels, value FROM samples'),
+                      key=sort_key)
+    lines = []
+    for base, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {base} {help_text}')
+        lines.append(f'# TYPE {base} {kind}')
+        for name, labels, value in rows:
+            if name != base and name.rpartition('_')[0] != base:
+                continue
+            labels = ','.join(
+                f'{key}="{escape(label)}"'
+                for key, label in json.loads(labels).items())
+            lines.append(f'{name}{{{labels}}} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
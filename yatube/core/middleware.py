@@ -0,0 +1,165 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from . import metrics, profiling
+from .slowqueries import SlowQueryLog
+from .timing import RequestTiming, current
+
+logger = logging.getLogger('yatube.timing')
+
+
+class ServerTimingMiddleware:
+    """Замеряет SQL, шаблоны и view запроса и отдает их в Server-Timing.
+
+    В выборку попадает доля REQUEST_TIMING_SAMPLE_RATE запросов; для
+    остальных middleware только сравнивает случайное число с долей.
+    Замер также пишется в лог yatube.timing строкой JSON с именем URL.
+    Заголовок получают только персонал и любой запрос при DEBUG: он
+    раскрывает, сколько SQL и времени уходит на страницу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        timing = request.timing = RequestTiming()
+        token = current.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        now = time.perf_counter()
+        timing.total = now - timing.started
+        if timing.view_started:
+            timing.view = now - timing.view_started
+        # request.user ставит AuthenticationMiddleware, она стоит ниже.
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = timing.server_timing()
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'url_name': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            **timing.as_dict(),
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = current.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+
+class QueryCounter:
+    """execute_wrapper, который только считает SQL-запросы."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Считает ответы, время ответа и SQL-запросы по имени URL в реестре
+    метрик.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        registry = metrics.registry
+        registry.inc(
+            'yatube_http_requests_total', view=view,
+            method=request.method, status=str(response.status_code))
+        registry.observe(
+            'yatube_http_request_duration_seconds', duration,
+            metrics.LATENCY_BUCKETS, view=view)
+        registry.observe(
+            'yatube_db_queries_per_request', counter.queries,
+            metrics.QUERY_BUCKETS, view=view)
+        return response
+
+
+class ProfileMiddleware:
+    """Профиль запроса персонала с ?__profile=cprofile или ?__profile=sample.
+
+    Вместо страницы отдается отчет: таблица pstats или стеки для
+    flamegraph. Профиль включает view, ORM и шаблоны; число профилей
+    в минуту ограничено PROFILE_RATE_LIMIT. Стоит после
+    AuthenticationMiddleware, чтобы видеть request.user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get('__profile')
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        if mode not in profiling.MODES:
+            return HttpResponse(
+                'Режим профиля: ' + ', '.join(profiling.MODES),
+                content_type='text/plain; charset=utf-8', status=400)
+        if not profiling.allow():
+            return HttpResponse(
+                'Слишком много профилей, попробуйте через минуту',
+                content_type='text/plain; charset=utf-8', status=429)
+        with profiling.PROFILERS[mode]() as profiler:
+            response = self.get_response(request)
+            if response.streaming:
+                # Потоковый ответ работает, пока его читают.
+                for _ in response.streaming_content:
+                    pass
+        response.close()
+        report = HttpResponse(
+            profiler.report(), content_type='text/plain; charset=utf-8')
+        report['X-Profiled-Status'] = response.status_code
+        if mode == 'sample':
+            report['Content-Disposition'] = (
+                'attachment; filename="profile.folded"')
+        return report
+
+
+class SlowQueryMiddleware:
+    """Пишет SQL-запросы дольше SLOW_QUERY_THRESHOLD в лог медленных."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            return self.get_response(request)
+        wrapper = SlowQueryLog(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
@@ -0,0 +1,121 @@
+import cProfile
+import io
+import os
+import pstats
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+MODES = ('cprofile', 'sample')
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS profiles (
+        minute INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+'''
+UPSERT = '''
+    INSERT INTO profiles (minute, count) VALUES (?, 1)
+    ON CONFLICT (minute) DO UPDATE SET count = count + 1
+'''
+
+
+def allow():
+    """Не больше PROFILE_RATE_LIMIT профилирований в минуту на весь сайт.
+
+    Счетчик лежит в общем для всех процессов файле METRICS_DB, а не в
+    кэше: LocMemCache считал бы профили каждого воркера отдельно. Если
+    файл недоступен, профилирование запрещается.
+    """
+    minute = int(time.time() // 60)
+    try:
+        db = sqlite3.connect(
+            settings.METRICS_DB, timeout=5, isolation_level=None)
+    except sqlite3.Error:
+        return False
+    try:
+        db.execute(CREATE_TABLE)
+        db.execute('BEGIN IMMEDIATE')
+        db.execute('DELETE FROM profiles WHERE minute < ?', (minute,))
+        db.execute(UPSERT, (minute,))
+        count, = db.execute(
+            'SELECT count FROM profiles WHERE minute = ?',
+            (minute,)).fetchone()
+        db.execute('COMMIT')
+    except sqlite3.Error:
+        return False
+    finally:
+        db.close()
+    return count <= settings.PROFILE_RATE_LIMIT
+
+
+def frame_name(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Sampler:
+    """Сэмплирующий профилировщик потока запроса.
+
+    Фоновый поток раз в PROFILE_SAMPLE_INTERVAL секунд снимает стек
+    потока запроса; одинаковые стеки складываются в счетчик. Отчет в
+    формате collapsed stacks читают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def report(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in sorted(
+                self.stacks.items()))
+
+
+class Profiler:
+    """cProfile запроса с отчетом pstats по суммарному времени."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+
+    def report(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats('cumulative')
+        stats.print_stats(settings.PROFILE_STATS_LIMIT)
+        return stream.getvalue()
+
+
+PROFILERS = {'cprofile': Profiler, 'sample': Sampler}
@@ -0,0 +1,161 @@
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger('yatube.slowqueries')
+logger.propagate = False
+
+# Код, в котором ищется вызвавшая запрос строка.
+SOURCE_DIR = os.path.join(settings.BASE_DIR, 'posts') + os.sep
+
+# Планы по запросу без значений: (время получения, план).
+plans = {}
+PLANS_LIMIT = 1000
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    """Запрос без значений: одинаковые запросы с разными id совпадут."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(params):
+    """Короткий хэш параметров: сами значения в лог не пишутся."""
+    return hashlib.md5(repr(params).encode()).hexdigest()[:12]
+
+
+def caller():
+    """Последняя строка кода posts/ в стеке запроса или None."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(SOURCE_DIR):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """План запроса SELECT или None, если его не получить.
+
+    Курсор create_cursor() не проходит через execute_wrapper, поэтому
+    сам EXPLAIN в лог не попадает. План одного и того же запроса без
+    значений запрашивается не чаще раза в SLOW_QUERY_EXPLAIN_INTERVAL
+    секунд: медленный запрос часто повторяется, когда база и так
+    нагружена.
+    """
+    is_select = sql.lstrip()[:6].upper() == 'SELECT'
+    if not settings.SLOW_QUERY_EXPLAIN or not is_select:
+        return None
+    key = (connection.alias, normalize(sql))
+    now = time.monotonic()
+    cached = plans.get(key)
+    if cached and now - cached[0] < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+        return cached[1]
+    prefix = ('EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+              else 'EXPLAIN')
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        plan = [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        plan = None
+    finally:
+        cursor.close()
+    if len(plans) >= PLANS_LIMIT:
+        plans.clear()
+    plans[key] = (now, plan)
+    return plan
+
+
+def get_handler():
+    """Обработчик лога в файл SLOW_QUERY_LOG.
+
+    В файл пишут все процессы сайта, поэтому он не ротируется сам:
+    WatchedFileHandler переоткрывает файл, когда logrotate его
+    переименует.
+    """
+    path = settings.SLOW_QUERY_LOG
+    for handler in logger.handlers:
+        if handler.baseFilename == os.path.abspath(path):
+            return handler
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+    handler = WatchedFileHandler(path, encoding='utf-8', delay=True)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+class SlowQueryLog:
+    """execute_wrapper, пишущий запросы дольше SLOW_QUERY_THRESHOLD.
+
+    Строка лога - JSON с SQL, хэшем параметров, временем, именем
+    view, строкой posts/, откуда пришел запрос, и планом SELECT.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                self.log(sql, params, many, context, duration)
+
+    def log(self, sql, params, many, context, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        get_handler()
+        logger.info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'duration': round(duration * 1000, 2),
+            'sql': sql,
+            'params': fingerprint(params),
+            'view': match.view_name if match else None,
+            'caller': caller(),
+            'plan': None if many else explain(
+                context['connection'], sql, params),
+        }, ensure_ascii=False))
+
+
+def read_entries(path):
+    """Записи лога вместе с ротированными файлами, от старых к новым.
+
+    Ротированные копии - path.1, path.2.gz и т. п., как у logrotate.
+    """
+    paths = sorted(glob.glob(glob.escape(path) + '.*'), key=os.path.getmtime)
+    if os.path.exists(path):
+        paths.append(path)
+    for name in paths:
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(name, 'rt', encoding='utf-8') as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,22 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TempMediaTestRunner(DiscoverRunner):
+    """Запускает тесты с MEDIA_ROOT во временном каталоге.
+
+    Загрузки и варианты картинок из тестов не попадают в media/.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='yatube-media-')
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        settings.MEDIA_ROOT = self.media_root
+        super().teardown_test_environment(**kwargs)
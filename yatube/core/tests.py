@@ -1,6 +1,19 @@
+import gzip
+import json
+import os
+import tempfile
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from . import metrics, slowqueries
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +24,260 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_server_timing(self):
+        """Замер запроса персонала попадает в Server-Timing и в лог."""
+        self.client.force_login(self.staff)
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'view;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'posts:index')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['templates'], 0)
+        self.assertGreaterEqual(record['total'], record['view'])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_header_staff_only(self):
+        """Остальным заголовок не отдается, но замер пишется в лог."""
+        with self.assertLogs('yatube.timing', 'INFO'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_sampling_off(self):
+        """Без выборки заголовка нет."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        db = os.path.join(directory.name, 'metrics.sqlite3')
+        settings = override_settings(METRICS_DB=db)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.registry.values.clear()
+        self.client.force_login(self.staff)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_requests_and_cache(self):
+        """Ответы, время, SQL и кэш страниц и карточек попадают в метрики."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        for line in (
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"} 2',
+            'yatube_http_request_duration_seconds_count'
+            '{view="posts:index"} 2',
+            'yatube_http_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2',
+            'yatube_db_queries_per_request_count{view="posts:index"} 2',
+            'yatube_cache_requests_total{cache="page",result="hit"} 1',
+            'yatube_cache_requests_total{cache="page",result="miss"} 1',
+            'yatube_cache_requests_total{cache="fragment",result="miss"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+        # Запросы считаются без выборки Server-Timing.
+        self.assertNotIn(
+            'yatube_db_queries_per_request_sum{view="posts:index"} 0\n',
+            text)
+
+    def test_processes_are_summed(self):
+        """Приращения разных процессов складываются в общем файле."""
+        for _ in range(2):
+            registry = metrics.Registry()
+            registry.inc('yatube_http_requests_total', view='about:author',
+                         method='GET', status='200')
+            registry.flush()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="about:author"} 2', self.scrape())
+
+    def test_failed_flush_kept(self):
+        """Если файл метрик недоступен, приращения не теряются."""
+        registry = metrics.Registry()
+        registry.inc('yatube_http_requests_total', view='about:author',
+                     method='GET', status='200')
+        # Вместо файла - каталог: SQLite не сможет его открыть.
+        with override_settings(METRICS_DB=self.directory):
+            with self.assertLogs('yatube.metrics', 'ERROR'):
+                registry.flush()
+        registry.flush()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="about:author"} 1', self.scrape())
+
+    def test_staff_only(self):
+        """Метрики видит только персонал."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class ProfileTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_DB=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.staff)
+        self.url = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+
+    def test_cprofile(self):
+        """Персонал получает таблицу cProfile вместо страницы."""
+        response = self.client.get(self.url, {'__profile': 'cprofile'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['X-Profiled-Status'], '200')
+        text = response.content.decode()
+        self.assertIn('cumulative', text)
+        self.assertIn('views.py', text)
+
+    def test_sample(self):
+        """Сэмплер отдает стеки для flamegraph файлом."""
+        response = self.client.get(self.url, {'__profile': 'sample'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('profile.folded', response['Content-Disposition'])
+
+    def test_unknown_mode(self):
+        response = self.client.get(self.url, {'__profile': 'gprof'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_not_staff(self):
+        """Остальные пользователи видят обычную страницу."""
+        self.client.force_login(self.author)
+        response = self.client.get(self.url, {'__profile': 'cprofile'})
+        self.assertTemplateUsed(response, 'posts/profile.html')
+
+    @override_settings(PROFILE_RATE_LIMIT=1)
+    def test_rate_limit(self):
+        """Профилей в минуту не больше PROFILE_RATE_LIMIT."""
+        self.client.get(self.url, {'__profile': 'cprofile'})
+        # Счетчик общий для процессов и не живет в кэше.
+        cache.clear()
+        response = self.client.get(self.url, {'__profile': 'cprofile'})
+        self.assertEqual(
+            response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+
+class SlowQueryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = os.path.join(directory.name, 'slowqueries.log')
+        settings = override_settings(
+            SLOW_QUERY_LOG=self.log, SLOW_QUERY_THRESHOLD=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(lambda: [
+            handler.close() for handler in slowqueries.logger.handlers])
+        slowqueries.plans.clear()
+
+    def test_entry(self):
+        """Запись лога: SQL, хэш параметров, view, код posts/ и план."""
+        self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.author.username}))
+        entries = list(slowqueries.read_entries(self.log))
+        self.assertTrue(entries)
+        entry = next(
+            entry for entry in entries if 'posts_post' in entry['sql'])
+        self.assertEqual(entry['view'], 'posts:profile')
+        self.assertTrue(entry['caller'].startswith('posts/'))
+        self.assertEqual(len(entry['params']), 12)
+        self.assertTrue(entry['plan'])
+        self.assertNotIn('EXPLAIN', ' '.join(
+            entry['sql'] for entry in entries))
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_normalize(self):
+        """Запросы с разными значениями сводятся к одному."""
+        self.assertEqual(
+            slowqueries.normalize(
+                "SELECT * FROM t WHERE id IN (%s, %s) AND a = 'x'\n LIMIT 5"),
+            'SELECT * FROM t WHERE id IN (...) AND a = ? LIMIT ?')
+
+    def test_plan_cached(self):
+        """План запроса с другими значениями берется из памяти."""
+        sql = 'SELECT id FROM posts_post WHERE id = %s'
+        first = slowqueries.explain(connection, sql, [1])
+        self.assertTrue(first)
+        self.assertIs(slowqueries.explain(connection, sql, [2]), first)
+        with self.settings(SLOW_QUERY_EXPLAIN_INTERVAL=0):
+            self.assertIsNot(slowqueries.explain(connection, sql, [3]), first)
+
+    def test_rotated(self):
+        """Копии logrotate, в том числе сжатые, читаются по порядку."""
+        with gzip.open(f'{self.log}.2.gz', 'wt', encoding='utf-8') as log:
+            log.write('{"sql": "old"}\n')
+        os.utime(f'{self.log}.2.gz', (0, 0))
+        with open(f'{self.log}.1', 'w', encoding='utf-8') as log:
+            log.write('{"sql": "rotated"}\n')
+        os.utime(f'{self.log}.1', (1, 1))
+        with open(self.log, 'w', encoding='utf-8') as log:
+            log.write('{"sql": "current"}\nне JSON\n')
+        self.assertEqual(
+            [entry['sql'] for entry in slowqueries.read_entries(self.log)],
+            ['old', 'rotated', 'current'])
+
+    def test_command(self):
+        """slowqueries группирует записи по запросу без значений."""
+        for _ in range(2):
+            cache.clear()
+            self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('slowqueries', log=self.log, sort='count', stdout=out)
+        self.assertIn('2 раз', out.getvalue())
+        self.assertIn('view: posts:index (2)', out.getvalue())
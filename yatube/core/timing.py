@@ -0,0 +1,79 @@
+import time
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+# Замер текущего запроса; None, если запрос не попал в выборку.
+current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Время и число SQL-запросов, время шаблонов и view одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.templates = 0.0
+        self.view = 0.0
+        self.view_started = None
+        self.total = 0.0
+        self._depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: считает запросы и их время."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def render(self, render, context, request):
+        # Вложенные render_to_string (например, карточки постов) уже
+        # входят во время внешнего шаблона.
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            return render(context, request)
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self.templates += time.perf_counter() - started
+
+    def as_dict(self):
+        """Длительности в миллисекундах."""
+        return {
+            'queries': self.queries,
+            'sql': round(self.sql * 1000, 2),
+            'templates': round(self.templates * 1000, 2),
+            'view': round(self.view * 1000, 2),
+            'total': round(self.total * 1000, 2),
+        }
+
+    def server_timing(self):
+        return ', '.join((
+            f'sql;dur={self.sql * 1000:.2f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.2f}',
+            f'view;dur={self.view * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ))
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = current.get()
+        if timing is None:
+            return super().render(context, request)
+        return timing.render(super().render, context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, время рендера которых видит RequestTiming."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
@@ -1,10 +1,82 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Count, Min, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 
-from .models import Comment, Follow, Group, Post
+from . import bulk, search
+from .forms import PostForm
+from .models import BulkAction, Comment, Follow, Group, Job, Post, User
+from .paginators import LimitedCountPaginator
+
+
+class PostAdminForm(PostForm):
+    class Meta(PostForm.Meta):
+        fields = '__all__'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список админки для больших таблиц.
+
+    Без COUNT(*) по всей таблице и с ограниченным подсчетом
+    отфильтрованных строк; связанные объекты выбираются одним JOIN.
+    """
+    paginator = LimitedCountPaginator
+    show_full_result_count = False
+
+
+class CommentActionForm(ActionForm):
+    author = forms.CharField(label='Новый автор (логин)', required=False)
+
+
+class PostActionForm(CommentActionForm):
+    group = forms.SlugField(label='Группа (slug)', required=False)
+
+
+class BulkActionsAdmin(LargeTableAdmin):
+    """Массовые действия в фоне вместо синхронных в запросе.
+
+    Стандартное delete_selected удаляет каскадом в одной транзакции
+    и блокирует SQLite на все время запроса, поэтому оно убрано.
+    """
+    action_form = CommentActionForm
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def submit(self, request, queryset, action, target=None):
+        bulk_action = bulk.submit(request.user, queryset, action, target)
+        self.message_user(request, format_html(
+            'Действие <a href="{}">{}</a> поставлено в очередь.',
+            reverse('admin:posts_bulkaction_change', args=[bulk_action.pk]),
+            bulk_action,
+        ))
+
+    def delete_in_background(self, request, queryset):
+        self.submit(request, queryset, BulkAction.DELETE)
+    delete_in_background.short_description = 'Удалить выбранные в фоне'
+
+    def reassign_author(self, request, queryset):
+        username = request.POST.get('author', '')
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            self.message_user(
+                request, f'Автор {username!r} не найден.', messages.ERROR)
+            return
+        self.submit(request, queryset, BulkAction.REASSIGN, author.pk)
+    reassign_author.short_description = 'Сменить автора выбранных в фоне'
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BulkActionsAdmin):
+    # Те же пределы размера картинки, что и на сайте.
+    form = PostAdminForm
+    action_form = PostActionForm
+    actions = ('delete_in_background', 'move_to_group', 'reassign_author')
     list_display = (
         'pk',
         'text',
@@ -12,11 +84,31 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group'
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
+    # Поиск идет по индексу FTS5, см. get_search_results.
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        query = search.build_query(search_term)
+        if not query or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return search.filter_matching(queryset, query), False
+
+    def move_to_group(self, request, queryset):
+        slug = request.POST.get('group', '')
+        group = Group.objects.filter(slug=slug).first()
+        if group is None:
+            self.message_user(
+                request, f'Группа {slug!r} не найдена.', messages.ERROR)
+            return
+        self.submit(request, queryset, BulkAction.MOVE, group.pk)
+    move_to_group.short_description = 'Перенести выбранные в группу в фоне'
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -25,20 +117,89 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
-    search_fields = ('slug',)
+    # Нужен и для автодополнения группы в PostAdmin.
+    search_fields = ('title', 'slug')
     list_filter = ('title',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BulkActionsAdmin):
     list_display = ('post', 'author', 'text', 'created')
-    list_filter = ('text', 'created')
-    search_fields = ('post', 'author', 'text')
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+    date_hierarchy = 'created'
+    search_fields = ('=author__username',)
+    actions = ('delete_in_background', 'reassign_author')
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
-    list_filter = ('user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = (
+        'pk',
+        'func',
+        'queue',
+        'priority',
+        'status',
+        'attempts',
+        'available_at',
+        'created',
+    )
+    list_filter = ('status', 'queue')
+    search_fields = ('func',)
+    actions = ('retry',)
+
+    def changelist_view(self, request, extra_context=None):
+        now = timezone.now()
+        ready = Q(status=Job.QUEUED, available_at__lte=now)
+        queues = Job.objects.values('queue').annotate(
+            ready=Count('pk', filter=ready),
+            delayed=Count(
+                'pk', filter=Q(status=Job.QUEUED, available_at__gt=now)),
+            failed=Count('pk', filter=Q(status=Job.FAILED)),
+            oldest=Min('available_at', filter=ready),
+        ).order_by('queue')
+        extra_context = {'queues': queues, **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def retry(self, request, queryset):
+        updated = queryset.update(
+            status=Job.QUEUED, attempts=0, available_at=timezone.now())
+        self.message_user(request, f'Задач поставлено в очередь: {updated}')
+    retry.short_description = 'Повторить выбранные задачи'
+
+
+@admin.register(BulkAction)
+class BulkActionAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'action',
+        'model_name',
+        'progress',
+        'status',
+        'user',
+        'created',
+        'finished',
+    )
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    exclude = ('ids',)
+
+    def progress(self, obj):
+        return f'{obj.done}/{obj.total}'
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
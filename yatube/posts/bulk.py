@@ -0,0 +1,113 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import timeline
+from .models import BulkAction, Comment, Group, Post, User
+from .tasks import run_in_background
+from .timeline import chunked
+
+
+def delete_batched(queryset):
+    """Удаляет строки queryset пачками, каждую в своей транзакции."""
+    while True:
+        with transaction.atomic():
+            batch = list(queryset.values_list('pk', flat=True)[
+                :settings.BULK_ACTION_BATCH_SIZE])
+            if not batch:
+                return
+            queryset.model.objects.filter(pk__in=batch).delete()
+
+
+def delete_posts(ids, target=None):
+    # Каскад к комментариям и лентам может быть больше самой пачки
+    # постов, поэтому его строки удаляются заранее своими пачками.
+    delete_batched(Comment.objects.filter(post_id__in=ids))
+    timeline.remove_posts(ids)
+    with transaction.atomic():
+        Post.objects.filter(pk__in=ids).delete()
+
+
+def move_posts(ids, group_id):
+    group = Group.objects.filter(pk=group_id).first()
+    if group is None:
+        return
+    posts = Post.objects.filter(pk__in=ids).exclude(group=group)
+    with transaction.atomic():
+        for post in posts.select_related('author', 'group'):
+            post.group = group
+            post.save()
+
+
+def _reassign(rows, author_id):
+    # Счетчики, кэш и ленты нового автора поправят сигналы save().
+    author = User.objects.filter(pk=author_id).first()
+    if author is None:
+        return
+    with transaction.atomic():
+        for row in rows.exclude(author=author).select_related('author'):
+            row.author = author
+            row.save()
+
+
+def reassign_posts(ids, author_id):
+    _reassign(Post.objects.filter(pk__in=ids), author_id)
+
+
+def delete_comments(ids, target=None):
+    with transaction.atomic():
+        Comment.objects.filter(pk__in=ids).delete()
+
+
+def reassign_comments(ids, author_id):
+    _reassign(Comment.objects.filter(pk__in=ids), author_id)
+
+
+HANDLERS = {
+    ('post', BulkAction.DELETE): delete_posts,
+    ('post', BulkAction.MOVE): move_posts,
+    ('post', BulkAction.REASSIGN): reassign_posts,
+    ('comment', BulkAction.DELETE): delete_comments,
+    ('comment', BulkAction.REASSIGN): reassign_comments,
+}
+
+
+def submit(user, queryset, action, target=None):
+    """Ставит массовое действие над queryset в очередь 'bulk'."""
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    bulk_action = BulkAction.objects.create(
+        model_name=queryset.model._meta.model_name,
+        action=action,
+        target=target,
+        ids=json.dumps(ids),
+        total=len(ids),
+        user=user,
+    )
+    run_in_background(process, bulk_action.pk, queue='bulk')
+    return bulk_action
+
+
+def process(bulk_action_id):
+    """Выполняет массовое действие пачками, начиная с необработанной.
+
+    Запись не дольше одной пачки, поэтому другие запросы успевают
+    писать в SQLite между пачками. Повтор пачки после падения
+    безопасен: обработчики пропускают уже измененные строки.
+    """
+    bulk_action = BulkAction.objects.filter(
+        pk=bulk_action_id, status=BulkAction.RUNNING).first()
+    if bulk_action is None:
+        return
+    handler = HANDLERS[bulk_action.model_name, bulk_action.action]
+    done = bulk_action.done
+    ids = json.loads(bulk_action.ids)[done:]
+    for chunk in chunked(ids, settings.BULK_ACTION_BATCH_SIZE):
+        handler(chunk, bulk_action.target)
+        # Позиция, а не приращение: даже если задачу выполнят два
+        # воркера, done не превысит total.
+        done += len(chunk)
+        BulkAction.objects.filter(pk=bulk_action.pk).update(done=done)
+    BulkAction.objects.filter(pk=bulk_action.pk).update(
+        status=BulkAction.DONE, finished=timezone.now())
@@ -0,0 +1,228 @@
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core import metrics
+
+from .models import Post
+
+VERSION_KEY = 'posts:version:{}'
+PAGE_KEY = 'posts:page:{versions}:{user}:{path}'
+COUNT_KEY = 'posts:count:{}'
+# Число, упершееся в POSTS_COUNT_ESTIMATE_LIMIT: сигналы его не правят.
+ESTIMATE_KEY = 'posts:estimate:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+
+# Пространства имен страниц; форматируются аргументами URL.
+INDEX = 'index'
+GROUP = 'group:{slug}'
+PROFILE = 'profile:{username}'
+TIMELINE = 'timeline:{user_id}'
+POST = 'post:{post_id}'
+
+
+def namespace_key(template, namespace):
+    """Ключ пространства без пробелов и не-ASCII, как требует memcached."""
+    return template.format(hashlib.md5(namespace.encode()).hexdigest())
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имен кэша страниц."""
+    keys = [namespace_key(VERSION_KEY, name) for name in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Версия из времени не повторит вытесненную из кэша.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_modified(namespaces):
+    """Время последней записи в любое из пространств namespaces."""
+    keys = [namespace_key(MODIFIED_KEY, name) for name in namespaces]
+    modified = cache.get_many(keys)
+    if len(modified) < len(keys):
+        # Время вытеснено из кэша: считаем, что запись была сейчас.
+        now = time.time()
+        cache.set_many(
+            {key: now for key in keys if key not in modified}, None)
+        return now
+    return max(modified.values())
+
+
+def bump(*namespaces):
+    """Делает устаревшими все закэшированные страницы namespaces.
+
+    Внутри транзакции версии меняются еще раз после коммита: до него
+    другой запрос может закэшировать старые строки под новой версией.
+    Первая смена нужна коду той же транзакции.
+    """
+    _bump(namespaces)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _bump(namespaces):
+    for namespace in set(namespaces):
+        key = namespace_key(VERSION_KEY, namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+    now = time.time()
+    cache.set_many(
+        {namespace_key(MODIFIED_KEY, name): now for name in namespaces},
+        None)
+
+
+def adjust_counts(delta, *namespaces):
+    """Поправляет закэшированное число постов лент namespaces.
+
+    Оценки под ESTIMATE_KEY не меняются: после поправки оценка
+    выглядела бы точным числом.
+    """
+    for namespace in namespaces:
+        try:
+            cache.incr(namespace_key(COUNT_KEY, namespace), delta)
+        except ValueError:
+            pass
+
+
+def forget_counts(*namespaces):
+    """Удаляет закэшированное число постов лент namespaces.
+
+    Внутри транзакции число удаляется еще раз после коммита, как
+    версии в bump: до него другой запрос пересчитал бы старые строки.
+    """
+    _forget_counts(namespaces)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _forget_counts(namespaces))
+
+
+def _forget_counts(namespaces):
+    cache.delete_many([
+        namespace_key(key, namespace)
+        for namespace in namespaces for key in (COUNT_KEY, ESTIMATE_KEY)])
+
+
+def cache_feed(*namespaces):
+    """Кэширует страницу до записи в любое из пространств namespaces.
+
+    Пространства имен форматируются аргументами URL, например
+    GROUP. Страницы авторизованных пользователей кэшируются
+    отдельно: шапка и кнопки подписки зависят от пользователя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(
+                namespace.format(**kwargs) for namespace in namespaces)
+            key = PAGE_KEY.format(
+                versions='.'.join(map(str, versions)),
+                user=request.user.pk or '',
+                path=hashlib.md5(
+                    request.get_full_path().encode()).hexdigest(),
+            )
+            response = cache.get(key)
+            metrics.count_cache('page', response is not None, response is None)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def post_detail_namespaces(request, post_id):
+    """Пространства страницы поста: сам пост, его автор и группа."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug').first()
+    if row is None:
+        return None
+    username, slug = row
+    namespaces = [
+        POST.format(post_id=post_id),
+        PROFILE.format(username=username),
+    ]
+    if slug:
+        namespaces.append(GROUP.format(slug=slug))
+    return namespaces
+
+
+def _namespaces(namespaces, request, *args, **kwargs):
+    names = []
+    for namespace in namespaces:
+        if not callable(namespace):
+            names.append(namespace.format(user_id=request.user.pk, **kwargs))
+            continue
+        found = namespace(request, *args, **kwargs)
+        if found is None:
+            return None
+        names.extend(found)
+    return names
+
+
+def _last_modified(names):
+    """Время записи, округленное вверх, или None, пока его секунда идет."""
+    last_modified = math.ceil(get_modified(names))
+    if last_modified > time.time():
+        return None
+    return last_modified
+
+
+def conditional(*namespaces):
+    """Отвечает 304 Not Modified, если страница не менялась.
+
+    ETag строится из версий пространств имен, как ключ cache_feed, и
+    не требует запросов к базе. Вместо строки можно передать функцию
+    (request, **kwargs), которая возвращает список пространств или
+    None - тогда ответ формирует view. Last-Modified отдается только
+    анонимам: вход и выход не меняют время записи в пространства.
+    Время записи округляется вверх до секунды, и пока эта секунда не
+    прошла, Last-Modified не отдается: иначе запись в ту же секунду
+    после ответа не изменила бы его, и клиент получил бы старый 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            names = None
+            if request.method in ('GET', 'HEAD'):
+                names = _namespaces(namespaces, request, *args, **kwargs)
+            if names is None:
+                return view(request, *args, **kwargs)
+            user = request.user
+            csrf = ''
+            if user.is_authenticated:
+                # Формы с токеном CSRF видят только авторизованные, а
+                # вход меняет токен.
+                get_token(request)
+                csrf = request.META['CSRF_COOKIE']
+            raw = '{}|{}|{}'.format(
+                '.'.join(map(str, get_versions(names))), user.pk or '', csrf)
+            etag = 'W/' + quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            last_modified = None
+            if not user.is_authenticated:
+                last_modified = _last_modified(names)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    if last_modified:
+                        response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,87 @@
+import datetime
+import json
+import zlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Group, Post
+
+# Тот же порядок и те же поля, что читает import_content.
+TYPES = ('group', 'post', 'comment', 'follow')
+
+EXPORTS = {
+    'group': (
+        Group.objects.all(), None,
+        ('slug', 'title', 'description')),
+    'post': (
+        Post.objects.all(), 'pub_date',
+        ('id', 'author__username', 'group__slug', 'text', 'pub_date',
+         'image')),
+    'comment': (
+        Comment.objects.all(), 'created',
+        ('id', 'post', 'author__username', 'text', 'created')),
+    # У подписок нет даты, они выгружаются целиком.
+    'follow': (
+        Follow.objects.all(), None,
+        ('user__username', 'author__username')),
+}
+
+
+def parse_since(value):
+    """Дата или дата и время начала выгрузки; None, если не разобрать."""
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        since = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    return since
+
+
+def export_rows(types=TYPES, since=None):
+    """Строки выгрузки по одной, без загрузки таблиц в память.
+
+    Каждая таблица читается iterator() пачками по EXPORT_CHUNK_SIZE
+    строк в порядке id. С since выгружаются только посты и
+    комментарии, созданные не раньше since.
+    """
+    for kind in TYPES:
+        if kind not in types:
+            continue
+        queryset, date_field, fields = EXPORTS[kind]
+        if since is not None and date_field:
+            queryset = queryset.filter(**{f'{date_field}__gte': since})
+        rows = queryset.order_by('pk').values_list(*fields).iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE)
+        names = [field.split('__')[0] for field in fields]
+        for values in rows:
+            row = {'type': kind, **dict(zip(names, values))}
+            if date_field:
+                row[date_field] = row[date_field].isoformat()
+            yield row
+
+
+def export_lines(types=TYPES, since=None):
+    for row in export_rows(types, since):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def gzip_chunks(lines, size=64 * 1024):
+    """Сжимает строки в gzip на лету кусками примерно по size байт."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    buffer = []
+    buffered = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            chunk = compressor.compress(b''.join(buffer))
+            buffer, buffered = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
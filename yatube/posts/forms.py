@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
 from .models import Comment, Post
 
@@ -12,6 +14,34 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversized = None
+        image = self.files.get('image')
+        if image and image.size > settings.POST_IMAGE_MAX_BYTES:
+            # Содержимое такого файла отброшено при загрузке, поэтому
+            # поле его не разбирает, а об ошибке сообщает clean_image.
+            self.oversized = image
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if self.oversized is not None:
+            raise forms.ValidationError(
+                'Файл больше '
+                f'{filesizeformat(settings.POST_IMAGE_MAX_BYTES)}: '
+                f'{filesizeformat(self.oversized.size)}.')
+        # Размер берется из заголовка, картинка не декодируется.
+        header = getattr(image, 'image', None)
+        if header is not None:
+            width, height = header.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise forms.ValidationError(
+                    f'Картинка {width}x{height} слишком большая: не больше '
+                    f'{settings.POST_IMAGE_MAX_PIXELS} пикселей.')
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
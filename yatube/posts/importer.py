@@ -0,0 +1,274 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, stats, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+from .timeline import chunked
+
+# Порядок записи пачек: комментарии ссылаются на уже записанные посты.
+TYPES = ('group', 'post', 'comment', 'follow')
+# Строк в одном UPDATE дат: по два параметра SQL на строку.
+DATE_UPDATE_SIZE = 200
+
+
+def read_rows(stream, file_format):
+    """Строки файла по одной: словари CSV или текст строк JSONL."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def assign_ids(model, objs):
+    """Проставляет id строкам, которые bulk_create записал без них.
+
+    Вызывается в транзакции bulk_create. В SQLite строки получают id
+    по AUTOINCREMENT, а запись держит базу до коммита, поэтому новые
+    строки - последние len(objs) в таблице.
+    """
+    missing = [obj for obj in objs if obj.pk is None]
+    if missing:
+        ids = model.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:len(missing)]
+        for obj, pk in zip(missing, sorted(ids)):
+            obj.pk = pk
+
+
+def bulk_create_dated(model, objs, field_name):
+    """bulk_create с датами источника в поле auto_now_add field_name.
+
+    bulk_create ставит в такое поле текущее время, поэтому даты
+    возвращаются отдельным UPDATE пачками. Поле модели не меняется:
+    параллельные save() других запросов получают свое время.
+    """
+    dates = [getattr(obj, field_name) for obj in objs]
+    with transaction.atomic():
+        model.objects.bulk_create(objs)
+        assign_ids(model, objs)
+        for chunk in chunked(list(zip(objs, dates)), DATE_UPDATE_SIZE):
+            model.objects.filter(
+                pk__in=[obj.pk for obj, date in chunk]
+            ).update(**{field_name: Case(
+                *(When(pk=obj.pk, then=Value(date)) for obj, date in chunk),
+                output_field=model._meta.get_field(field_name),
+            )})
+    for obj, date in zip(objs, dates):
+        setattr(obj, field_name, date)
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Importer:
+    """Импорт групп, постов, комментариев и подписок пачками bulk_create.
+
+    Сигналы моделей не вызываются: счетчики, ленты подписок, превью
+    и кэш страниц обновляются один раз на пачку. Память не растет с
+    размером входа: в ней только текущие пачки и LRU-кэш авторов и
+    групп. Посты сохраняют id источника, остальным id назначает база.
+    Пачка, нарушившая ограничения базы, пропускается целиком и
+    передается в on_error, импорт продолжается.
+    """
+
+    def __init__(self, batch_size=None, media_from=None,
+                 create_missing=False, report=None, on_error=None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.media_from = media_from
+        self.create_missing = create_missing
+        self.report = report
+        self.on_error = on_error
+        self.user_id = lru_cache(settings.IMPORT_LOOKUP_CACHE_SIZE)(
+            self._user_id)
+        self.group_id = lru_cache(settings.IMPORT_LOOKUP_CACHE_SIZE)(
+            self._group_id)
+        self.batches = {kind: [] for kind in TYPES}
+        self.namespaces = set()
+        self.imported = Counter()
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    def _user_id(self, username):
+        pk = User.objects.filter(username=username).values_list(
+            'pk', flat=True).first()
+        if pk is None and self.create_missing:
+            pk = User.objects.create_user(username=username).pk
+        return pk
+
+    def _group_id(self, slug):
+        pk = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True).first()
+        if pk is None and self.create_missing:
+            pk = Group.objects.create(slug=slug, title=slug).pk
+        return pk
+
+    def author(self, username):
+        pk = self.user_id(username) if username else None
+        if pk is None:
+            raise ValueError(f'пользователь {username!r} не найден')
+        self.namespaces.add(caching.PROFILE.format(username=username))
+        return pk
+
+    def image(self, name):
+        if not name or not self.media_from:
+            return name or ''
+        with open(os.path.join(self.media_from, name), 'rb') as source:
+            return default_storage.save(
+                f'posts/{os.path.basename(name)}', File(source))
+
+    def build_group(self, row):
+        return Group(
+            slug=row['slug'],
+            title=row['title'],
+            description=row.get('description') or '',
+        )
+
+    def build_post(self, row):
+        group_id = None
+        if row.get('group'):
+            group_id = self.group_id(row['group'])
+            if group_id is None:
+                raise ValueError(f'группа {row["group"]!r} не найдена')
+            self.namespaces.add(caching.GROUP.format(slug=row['group']))
+        return Post(
+            pk=int(row['id']) if row.get('id') else None,
+            author_id=self.author(row.get('author')),
+            group_id=group_id,
+            text=row['text'],
+            pub_date=parse_date(row.get('pub_date')),
+            image=self.image(row.get('image')),
+        )
+
+    def build_comment(self, row):
+        post_id = int(row['post'])
+        self.namespaces.add(caching.POST.format(post_id=post_id))
+        return Comment(
+            post_id=post_id,
+            author_id=self.author(row.get('author')),
+            text=row['text'],
+            created=parse_date(row.get('created')),
+        )
+
+    def build_follow(self, row):
+        user_id = self.author(row.get('user'))
+        author_id = self.author(row.get('author'))
+        if user_id == author_id:
+            raise ValueError('подписка на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def add(self, row, kind=None):
+        """Разбирает строку и добавляет ее в пачку своего типа.
+
+        Строки с ошибками пропускаются; возвращает текст ошибки.
+        """
+        try:
+            if isinstance(row, str):
+                row = json.loads(row)
+            kind = row.get('type') or kind
+            if kind not in TYPES:
+                raise ValueError(f'неизвестный тип {kind!r}')
+            obj = getattr(self, f'build_{kind}')(row)
+        except (KeyError, ValueError, TypeError, OSError) as error:
+            self.skipped += 1
+            return str(error)
+        self.batches[kind].append(obj)
+        if kind == 'group':
+            # Посты ниже по файлу ищут группу по slug.
+            self.write(kind)
+        elif len(self.batches[kind]) >= self.batch_size:
+            self.flush()
+        return None
+
+    def write(self, kind):
+        batch = self.batches[kind]
+        if batch:
+            try:
+                written = getattr(self, f'write_{kind}s')(batch)
+            except IntegrityError as error:
+                # Например, id поста уже занят.
+                written = 0
+                if self.on_error:
+                    self.on_error(kind, len(batch), error)
+            self.imported[kind] += written
+            self.skipped += len(batch) - written
+            self.batches[kind] = []
+
+    def flush(self):
+        """Записывает все накопленные пачки и сбрасывает кэш страниц."""
+        for kind in TYPES:
+            self.write(kind)
+        namespaces = [caching.INDEX, *self.namespaces]
+        caching.forget_counts(*namespaces)
+        caching.bump(*namespaces)
+        self.namespaces = set()
+        if self.report:
+            self.report(self)
+
+    @property
+    def rate(self):
+        seconds = time.monotonic() - self.started
+        return sum(self.imported.values()) / seconds if seconds else 0
+
+    def write_groups(self, groups):
+        # Существующие группы с тем же slug не меняются.
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        self.group_id.cache_clear()
+        return len(groups)
+
+    def write_posts(self, posts):
+        with transaction.atomic():
+            bulk_create_dated(Post, posts, 'pub_date')
+            for author_id, count in Counter(
+                    post.author_id for post in posts).items():
+                stats.bump(author_id, 'posts_count', count)
+        timeline.fan_out_posts(posts)
+        for post in posts:
+            if post.image:
+                thumbnails.enqueue(post.pk)
+        return len(posts)
+
+    def write_comments(self, comments):
+        existing = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list('pk', flat=True))
+        comments = [
+            comment for comment in comments if comment.post_id in existing]
+        with transaction.atomic():
+            bulk_create_dated(Comment, comments, 'created')
+            for author_id, count in Counter(
+                    comment.author_id for comment in comments).items():
+                stats.bump(author_id, 'comments_count', count)
+        return len(comments)
+
+    def write_follows(self, follows):
+        # Повторные подписки пропускаются, поэтому счетчики
+        # пересчитываются, а не прибавляются.
+        with transaction.atomic():
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+            users = {follow.user_id for follow in follows}
+            users.update(follow.author_id for follow in follows)
+            stats.recount(User.objects.filter(pk__in=users))
+        for follow in follows:
+            timeline.backfill(follow.user_id, follow.author_id)
+        return len(follows)
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+
+# Признаки плана, которых не должно быть в запросах лент.
+BAD_PLAN_MARKERS = ('USE TEMP B-TREE',)
+# Таблицы лент: страница после курсора должна искаться по диапазону.
+FEED_TABLES = ('posts_post', 'posts_timelineentry')
+
+
+def is_full_scan(line, cursor=False):
+    """SCAN без индекса, а для страницы после курсора - любой SCAN ленты.
+
+    SCAN ... USING INDEX проходит индекс с начала и отбрасывает строки
+    до курсора, поэтому глубокая страница стоит столько же, сколько
+    OFFSET.
+    """
+    if 'SCAN' not in line:
+        return False
+    if cursor and any(f'SCAN {table} ' in f'{line} ' for table in FEED_TABLES):
+        return True
+    return 'USING' not in line
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN QUERY PLAN для запросов каждой ленты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Автор для profile/follow.')
+        parser.add_argument('--group', help='Слаг группы для group_posts.')
+
+    def handle(self, *args, **options):
+        user = self.get_object(User, 'username', options['username'])
+        group = self.get_object(Group, 'slug', options['group'])
+        post = Post.objects.order_by('-pub_date', 'id').first()
+        if None in (user, group, post):
+            raise CommandError(
+                'Нужны хотя бы один пользователь, группа и пост.'
+            )
+        limit = settings.POSTS_PER_PAGE
+        queries = (
+            ('index', Post.objects.for_feed(), False),
+            ('group_posts', group.posts.for_feed(), False),
+            ('profile', user.posts.for_feed(), False),
+            ('follow_index', user.timeline.for_feed(), False),
+            ('index (cursor)', CursorPaginator(
+                Post.objects.for_feed(), limit
+            ).after(post.pub_date, post.pk), True),
+            ('follow_index (cursor)', CursorPaginator(
+                user.timeline.for_feed(), limit, 'post_id'
+            ).after(post.pub_date, post.pk), True),
+            ('post_detail comments', post.comments.all(), False),
+            ('profile_follow', Follow.objects.filter(
+                user=user, author=post.author), False),
+        )
+        problems = 0
+        for name, queryset, cursor in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in queryset[:limit].explain().splitlines():
+                bad = is_full_scan(line, cursor) or any(
+                    marker in line for marker in BAD_PLAN_MARKERS)
+                problems += bad
+                self.stdout.write(
+                    self.style.WARNING(line) if bad else line
+                )
+        if problems:
+            self.stdout.write(self.style.WARNING(
+                f'Проблемных шагов плана: {problems}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Полных сканирований и временных сортировок нет.'))
+
+    def get_object(self, model, field, value):
+        queryset = model.objects.order_by('pk')
+        if value is None:
+            return queryset.first()
+        try:
+            return queryset.get(**{field: value})
+        except model.DoesNotExist:
+            raise CommandError(f'{model.__name__} {value!r} не найден.')
@@ -0,0 +1,53 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import TYPES, export_lines, parse_since
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL, '
+        'который читает import_content.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл выгрузки; - пишет в stdout.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжать gzip; включается и расширением .gz.')
+        parser.add_argument(
+            '--type', action='append', dest='types', choices=TYPES,
+            help='Выгрузить только этот тип; можно повторять.')
+        parser.add_argument(
+            '--since',
+            help='Только посты и комментарии не старше этой даты.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_since(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная дата: {options["since"]}')
+        path = options['output']
+        compress = options['gzip'] or path.endswith('.gz')
+        if path == '-':
+            output = (
+                gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8')
+                if compress else self.stdout)
+        elif compress:
+            output = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            output = open(path, 'w', encoding='utf-8')
+        count = 0
+        try:
+            for line in export_lines(options['types'] or TYPES, since):
+                output.write(line)
+                count += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        self.stderr.write(f'Выгружено строк: {count}')
@@ -0,0 +1,80 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import TYPES, Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, посты, комментарии и подписки из JSONL или '
+        'CSV. Поля: group - slug, title, description; '
+        'post - id, author, group, text, pub_date, image; '
+        'comment - post, author, text, created; follow - user, author. '
+        'В JSONL тип строки можно указать полем type.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help='Файлы для импорта, можно .gz; - читает stdin.')
+        parser.add_argument(
+            '--type', choices=TYPES,
+            help='Тип строк без поля type; для CSV обязателен.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файлов; по умолчанию по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Сколько строк записывать одним bulk_create.')
+        parser.add_argument(
+            '--media-from',
+            help='Каталог с картинками: они копируются в MEDIA_ROOT.')
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать отсутствующих пользователей и группы.')
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            batch_size=options['batch_size'],
+            media_from=options['media_from'],
+            create_missing=options['create_missing'],
+            report=self.report,
+            on_error=self.batch_error,
+        )
+        for path in options['paths']:
+            self.import_file(importer, path, options)
+        importer.flush()
+        self.stdout.write(self.style.SUCCESS(
+            'Импорт завершен. ' + self.summary(importer)))
+
+    def import_file(self, importer, path, options):
+        compressed = path.endswith('.gz')
+        name = path[:-len('.gz')] if compressed else path
+        file_format = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl')
+        if file_format == 'csv' and not options['type']:
+            raise CommandError('Для CSV укажите --type.')
+        if path == '-':
+            stream = sys.stdin
+        else:
+            stream = (gzip.open if compressed else open)(
+                path, 'rt', encoding='utf-8', newline='')
+        with stream:
+            for number, row in enumerate(read_rows(stream, file_format), 1):
+                error = importer.add(row, options['type'])
+                if error:
+                    self.stderr.write(f'{path}:{number}: {error}')
+
+    def summary(self, importer):
+        imported = ', '.join(
+            f'{kind}: {importer.imported[kind]}' for kind in TYPES)
+        return (f'{imported}, пропущено: {importer.skipped}, '
+                f'строк/с: {importer.rate:.0f}')
+
+    def batch_error(self, kind, size, error):
+        self.stderr.write(f'Пачка {kind} из {size} строк не записана: {error}')
+
+    def report(self, importer):
+        self.stdout.write(self.summary(importer))
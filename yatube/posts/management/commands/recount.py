@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики профилей и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*', help='Только эти пользователи.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Пользователей в одной транзакции.')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        fixed = stats.recount(users, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: {fixed}'))
@@ -0,0 +1,53 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько процессов-воркеров запустить.')
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Брать задачи только из этой очереди; можно повторять.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить доступные задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        queues, once = options['queues'], options['once']
+        if options['processes'] < 2:
+            self.work(queues, once)
+            return
+        # Открытые соединения нельзя делить между процессами.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=self.work, args=(queues, once))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        signal.signal(
+            signal.SIGTERM,
+            lambda *args: [worker.terminate() for worker in workers])
+        for worker in workers:
+            while worker.is_alive():
+                try:
+                    worker.join()
+                except KeyboardInterrupt:
+                    # Ctrl+C получила вся группа процессов.
+                    pass
+
+    def work(self, queues, once):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: tasks.stop())
+        done = tasks.work(queues, once=once)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_STATS = '''
+    INSERT INTO posts_authorstats (
+        user_id, posts_count, comments_count,
+        followers_count, following_count
+    )
+    SELECT
+        u.id,
+        (SELECT COUNT(*) FROM posts_post WHERE author_id = u.id),
+        (SELECT COUNT(*) FROM posts_comment WHERE author_id = u.id),
+        (SELECT COUNT(*) FROM posts_follow WHERE author_id = u.id),
+        (SELECT COUNT(*) FROM posts_follow WHERE user_id = u.id)
+    FROM {user_table} AS u
+'''
+
+
+def fill_stats(apps, schema_editor):
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute(FILL_STATS.format(
+        user_table=schema_editor.quote_name(user_table)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Посты')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментарии')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписки')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
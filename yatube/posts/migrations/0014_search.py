@@ -0,0 +1,113 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations
+
+# Полнотекстовый индекс постов. Обычная (не external content) таблица
+# FTS5: автора и группы нет в posts_post, поэтому храним их копию.
+# rowid таблицы - id поста. Ранжирование bm25 с весами колонок
+# text, author, group_title задается конфигурацией rank.
+CREATE_TABLE = [
+    '''
+    CREATE VIRTUAL TABLE posts_search USING fts5(
+        text, author, group_title,
+        tokenize = "unicode61 remove_diacritics 2"
+    )
+    ''',
+    '''
+    INSERT INTO posts_search (posts_search, rank)
+    VALUES ('rank', 'bm25(1.0, 2.0, 2.0)')
+    ''',
+]
+
+SELECT_ROWS = '''
+    SELECT post.id, post.text,
+           author.username || ' ' || author.first_name
+           || ' ' || author.last_name,
+           COALESCE(grp.title, '')
+    FROM posts_post AS post
+    INNER JOIN {user_table} AS author ON author.id = post.author_id
+    LEFT JOIN posts_group AS grp ON grp.id = post.group_id
+'''
+
+INSERT_ROWS = (
+    'INSERT INTO posts_search (rowid, text, author, group_title)'
+    + SELECT_ROWS
+)
+
+CREATE_TRIGGERS = [
+    f'''
+    CREATE TRIGGER posts_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        {INSERT_ROWS} WHERE post.id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_search_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = OLD.id;
+        {INSERT_ROWS} WHERE post.id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_search_author
+    AFTER UPDATE OF username, first_name, last_name ON {user_table}
+    BEGIN
+        UPDATE posts_search
+        SET author = NEW.username || ' ' || NEW.first_name
+                     || ' ' || NEW.last_name
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_search_group AFTER UPDATE OF title ON posts_group
+    BEGIN
+        UPDATE posts_search SET group_title = NEW.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = NEW.id);
+    END
+    ''',
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_search_insert',
+    'DROP TRIGGER IF EXISTS posts_search_update',
+    'DROP TRIGGER IF EXISTS posts_search_delete',
+    'DROP TRIGGER IF EXISTS posts_search_author',
+    'DROP TRIGGER IF EXISTS posts_search_group',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+def create_search(apps, schema_editor):
+    # На других СУБД поиск работает через LIKE, см. posts.search.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    for sql in CREATE_TABLE + CREATE_TRIGGERS + [INSERT_ROWS]:
+        schema_editor.execute(sql.format(user_table=user_table))
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
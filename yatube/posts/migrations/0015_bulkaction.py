@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 10:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkAction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Модель')),
+                ('action', models.CharField(choices=[('delete', 'Удаление'), ('move', 'Перенос в группу'), ('reassign', 'Смена автора')], max_length=10, verbose_name='Действие')),
+                ('target', models.PositiveIntegerField(blank=True, help_text='id новой группы или нового автора', null=True, verbose_name='Группа или автор')),
+                ('ids', models.TextField(verbose_name='id строк')),
+                ('total', models.PositiveIntegerField(verbose_name='Всего строк')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Обработано')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('done', 'Готово')], default='running', max_length=10, verbose_name='Статус')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Массовое действие',
+                'verbose_name_plural': 'Массовые действия',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db.models import UniqueConstraint
@@ -28,6 +30,20 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля, которые читает карточка поста posts/includes/post.html.
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'updated', 'image', 'image_variants',
+        'author', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group', 'group__slug', 'group__title',
+    )
+
+    def for_feed(self):
+        """Посты для ленты: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
@@ -37,6 +53,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -57,14 +77,37 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def variants(self):
+        """Варианты картинки: формат -> [[ширина, имя файла], ...]."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', 'id'], name='post_pub_date_id_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -88,6 +131,11 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name_plural = 'Коментарии'
         verbose_name = 'Коментарий'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -111,6 +159,233 @@ class Follow(models.Model):
         constraints = [
             UniqueConstraint(fields=['author', 'user'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписался на {self.author.username}'
+
+
+class TimelineQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Записи ленты с постами, готовыми для карточки."""
+        return self.select_related('post__author', 'post__group').only(
+            'user', 'pub_date', 'post',
+            *(f'post__{field}' for field in PostQuerySet.FEED_FIELDS)
+        ).order_by('-pub_date', 'post_id')
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Строки пишутся при публикации поста и при подписке, поэтому
+    follow_index читает уже отсортированную ленту по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    objects = TimelineQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'Ленты подписок'
+        verbose_name = 'Запись ленты подписок'
+        constraints = [
+            UniqueConstraint(fields=['user', 'post'], name='unique_timeline')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class AuthorStats(models.Model):
+    """Счетчики пользователя для страницы профиля.
+
+    Обновляются сигналами Post, Comment и Follow, расхождения
+    исправляет команда recount.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Посты')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментарии')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчики')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписки')
+
+    class Meta:
+        verbose_name_plural = 'Статистика авторов'
+        verbose_name = 'Статистика автора'
+
+    def __str__(self):
+        return f'Статистика {self.user_id}'
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди, которую выполняет команда runworker.
+
+    Взятая задача остается в таблице с отодвинутым available_at: если
+    воркер упадет, она снова станет доступна после таймаута видимости.
+    Выполненные задачи удаляются.
+    """
+    QUEUED = 'queued'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (FAILED, 'Ошибка'),
+    )
+
+    queue = models.CharField(
+        max_length=50,
+        default='default',
+        verbose_name='Очередь')
+    func = models.CharField(
+        max_length=200,
+        verbose_name='Функция')
+    args = models.TextField(
+        default='[]',
+        verbose_name='Аргументы')
+    priority = models.SmallIntegerField(
+        default=0,
+        verbose_name='Приоритет',
+        help_text='Задачи с большим приоритетом выполняются раньше')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания')
+    available_at = models.DateTimeField(
+        verbose_name='Доступна с')
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Воркер')
+    error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name_plural = 'Фоновые задачи'
+        verbose_name = 'Фоновая задача'
+        indexes = [
+            models.Index(
+                fields=['status', 'queue', '-priority', 'available_at'],
+                name='job_claim_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.func}{tuple(json.loads(self.args))}'
+
+
+class BulkAction(models.Model):
+    """Массовое действие админки над постами или комментариями.
+
+    Воркер выполняет его пачками по BULK_ACTION_BATCH_SIZE строк, каждая
+    в своей транзакции, и сохраняет прогресс в done. После падения
+    воркера действие продолжается с первой необработанной пачки.
+    """
+    DELETE = 'delete'
+    MOVE = 'move'
+    REASSIGN = 'reassign'
+    ACTIONS = (
+        (DELETE, 'Удаление'),
+        (MOVE, 'Перенос в группу'),
+        (REASSIGN, 'Смена автора'),
+    )
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUSES = (
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+    )
+
+    model_name = models.CharField(
+        max_length=50,
+        verbose_name='Модель')
+    action = models.CharField(
+        max_length=10,
+        choices=ACTIONS,
+        verbose_name='Действие')
+    target = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Группа или автор',
+        help_text='id новой группы или нового автора')
+    ids = models.TextField(
+        verbose_name='id строк')
+    total = models.PositiveIntegerField(
+        verbose_name='Всего строк')
+    done = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=RUNNING,
+        verbose_name='Статус')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания')
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения')
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name_plural = 'Массовые действия'
+        verbose_name = 'Массовое действие'
+
+    def __str__(self):
+        return (f'{self.get_action_display()} ({self.model_name}): '
+                f'{self.done}/{self.total}')
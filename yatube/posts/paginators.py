@@ -0,0 +1,216 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import COUNT_KEY, ESTIMATE_KEY, namespace_key
+
+
+def encode_cursor(post):
+    """Упаковывает позицию поста (pub_date, id) в непрозрачный токен."""
+    raw = f'{post.pub_date.isoformat()}|{post.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: без номера и общего числа страниц."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Глубина страницы не влияет на стоимость запроса: каждая страница
+    выбирается по индексу от позиции, закодированной в токене. Порядок
+    (-pub_date, id) совпадает с индексами Post, сортировка не нужна.
+    Условие по дате повторяется вне OR: иначе SQLite не видит в нем
+    диапазон индекса и проходит индекс с начала.
+    """
+
+    def __init__(self, object_list, per_page, id_field='pk'):
+        self.id_field = id_field
+        super().__init__(
+            object_list.order_by('-pub_date', id_field), per_page
+        )
+
+    def after(self, pub_date, pk):
+        """Строки ленты после позиции (pub_date, pk)."""
+        return self.object_list.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, **{f'{self.id_field}__gt': pk}),
+            pub_date__lte=pub_date,
+        )
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        queryset = self.object_list
+        if before is not None:
+            pub_date, pk = before
+            rows = list(queryset.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, **{f'{self.id_field}__lt': pk}),
+                pub_date__gte=pub_date,
+            ).order_by('pub_date', f'-{self.id_field}')[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        if after is not None:
+            queryset = self.after(*after)
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, after is not None
+        )
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берет COUNT(*) из кэша.
+
+    Число хранится под ключом ленты count_key (или под хэшем SQL
+    запроса) и поправляется сигналами при создании и удалении постов.
+    С estimate_limit считается не больше estimate_limit строк, а
+    страниц показывается не больше, чем помещается в этот предел.
+    Такая оценка хранится отдельно и сигналами не поправляется.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 estimate_limit=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.estimate_limit = estimate_limit
+
+    def signature(self):
+        return hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+
+    @cached_property
+    def cached_count(self):
+        name = self.count_key or self.signature()
+        keys = [namespace_key(COUNT_KEY, name)]
+        if self.estimate_limit is not None:
+            keys.append(namespace_key(ESTIMATE_KEY, name))
+        cached = cache.get_many(keys)
+        count = next((cached[key] for key in keys if key in cached), None)
+        if count is None:
+            rows = self.object_list.order_by()
+            if self.estimate_limit is not None:
+                rows = rows[:self.estimate_limit + 1]
+            count = rows.count()
+            estimated = (
+                self.estimate_limit is not None
+                and count > self.estimate_limit)
+            cache.set(keys[estimated], count,
+                      settings.POSTS_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @property
+    def estimated(self):
+        return (
+            self.estimate_limit is not None
+            and self.cached_count > self.estimate_limit
+        )
+
+    @cached_property
+    def count(self):
+        if self.estimated:
+            return self.estimate_limit
+        return self.cached_count
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """Номера страниц: края и окрестность текущей, пропуски - ELLIPSIS.
+
+        Тот же алгоритм, что у Paginator.get_elided_page_range в Django 3.2.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class LimitedCountPaginator(Paginator):
+    """Paginator, который считает не больше count_limit строк.
+
+    Для списков админки по большим таблицам: COUNT(*) по миллионам
+    строк дороже самой страницы. Если строк больше предела, count
+    равен пределу, а estimated - True.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count_limit=None):
+        super().__init__(
+            object_list, per_page, orphans, allow_empty_first_page)
+        self.count_limit = count_limit or settings.ADMIN_COUNT_LIMIT
+
+    @cached_property
+    def cached_count(self):
+        rows = self.object_list.order_by()[:self.count_limit + 1]
+        return rows.count()
+
+    @property
+    def estimated(self):
+        return self.cached_count > self.count_limit
+
+    @cached_property
+    def count(self):
+        return min(self.cached_count, self.count_limit)
@@ -0,0 +1,208 @@
+import base64
+import binascii
+import re
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, User
+from .paginators import CursorPage, CursorPaginator
+from .timeline import chunked
+
+TABLE = 'posts_search'
+# Сколько слов запроса учитывать; остальные отбрасываются.
+MAX_TERMS = 8
+# Границы совпадений в snippet(): управляющие символы не встречаются
+# в тексте после escape и заменяются на <mark>.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 32
+
+SELECT_PAGE = f'''
+    SELECT rowid, rank,
+           snippet({TABLE}, 0, '{MARK_START}', '{MARK_END}', '…',
+                   {SNIPPET_TOKENS})
+    FROM {TABLE}
+    WHERE {TABLE} MATCH %s {{position}}
+    ORDER BY {{order}}
+    LIMIT %s
+'''
+AFTER = 'AND (rank > %s OR (rank = %s AND rowid > %s))'
+BEFORE = 'AND (rank < %s OR (rank = %s AND rowid < %s))'
+
+REBUILD_ROWS = f'''
+    INSERT INTO {TABLE} (rowid, text, author, group_title)
+    SELECT post.id, post.text,
+           author.username || ' ' || author.first_name
+           || ' ' || author.last_name,
+           COALESCE(grp.title, '')
+    FROM posts_post AS post
+    INNER JOIN {{user_table}} AS author ON author.id = post.author_id
+    LEFT JOIN posts_group AS grp ON grp.id = post.group_id
+    WHERE post.id BETWEEN %s AND %s
+'''
+DELETE_ROWS = f'DELETE FROM {TABLE} WHERE rowid BETWEEN %s AND %s'
+
+
+def is_available():
+    """FTS5-индекс создается миграцией только в SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def build_query(text):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки, поэтому операторы FTS5 (AND, NEAR,
+    двоеточие, звездочка) ищутся как обычный текст. Последнее слово
+    ищется по префиксу: результаты появляются еще до конца ввода.
+    """
+    terms = re.findall(r'\w+', text.lower())[:MAX_TERMS]
+    if not terms:
+        return ''
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def filter_matching(queryset, query):
+    """Посты queryset, подходящие под запрос FTS5 query.
+
+    Условие пишется через extra: pk__in=RawSQL(...) дает IN ((SELECT
+    ...)), и SQLite сравнивает id только с первой строкой подзапроса.
+    """
+    column = '.'.join(map(connection.ops.quote_name, (
+        queryset.model._meta.db_table, queryset.model._meta.pk.column)))
+    return queryset.extra(
+        where=[f'{column} IN (SELECT rowid FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s)'],
+        params=[query])
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>'))
+
+
+def encode_cursor(post):
+    """Упаковывает позицию результата (rank, id) в непрозрачный токен."""
+    raw = f'{post.search_rank!r}|{post.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk = raw.decode().split('|')
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPage(CursorPage):
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+class SearchPaginator(Paginator):
+    """Результаты поиска по релевантности bm25 с пагинацией по ключу.
+
+    Позиция - пара (rank, rowid), поэтому глубокие страницы не
+    требуют OFFSET. Ранг зависит от статистики всего индекса: если
+    между запросами страниц добавились посты, граница может сдвинуться.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.query = query
+
+    def fetch(self, position, params, order):
+        sql = SELECT_PAGE.format(position=position, order=order)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [self.query, *params, self.per_page + 1])
+            rows = cursor.fetchall()
+        more = len(rows) > self.per_page
+        return rows[:self.per_page], more
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None:
+            rank, pk = before
+            rows, has_previous = self.fetch(
+                BEFORE, (rank, rank, pk), 'rank DESC, rowid DESC')
+            return SearchPage(self.load(rows[::-1]), self, True, has_previous)
+        if after is not None:
+            rank, pk = after
+            rows, has_next = self.fetch(
+                AFTER, (rank, rank, pk), 'rank, rowid')
+        else:
+            rows, has_next = self.fetch('', (), 'rank, rowid')
+        return SearchPage(
+            self.load(rows), self, has_next, after is not None)
+
+    def load(self, rows):
+        posts = Post.objects.for_feed().in_bulk(row[0] for row in rows)
+        found = []
+        for pk, rank, snippet in rows:
+            # Пост мог быть удален после выборки из индекса.
+            post = posts.get(pk)
+            if post is not None:
+                post.search_rank = rank
+                post.snippet = highlight(snippet)
+                found.append(post)
+        return found
+
+
+def get_page(text, after=None, before=None):
+    """Страница результатов поиска text или None для пустого запроса."""
+    query = build_query(text)
+    if not query:
+        return None
+    if is_available():
+        paginator = SearchPaginator(query, settings.POSTS_PER_PAGE)
+        return paginator.get_page(after=after, before=before)
+    posts = Post.objects.for_feed()
+    for term in re.findall(r'\w+', text)[:MAX_TERMS]:
+        posts = posts.filter(text__icontains=term)
+    paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE)
+    page = paginator.get_page(after=after, before=before)
+    for post in page:
+        post.snippet = post.text
+    return page
+
+
+def rebuild(batch_size=None):
+    """Пересобирает индекс поиска пачками id постов.
+
+    Каждая пачка заменяется в своей транзакции: база не блокируется
+    на все время пересборки, а поиск не видит пустого индекса.
+    Возвращает число проиндексированных постов.
+    """
+    batch_size = batch_size or settings.SEARCH_BATCH_SIZE
+    insert = REBUILD_ROWS.format(user_table=User._meta.db_table)
+    ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+    start = total = 0
+    with connection.cursor() as cursor:
+        for chunk in chunked(ids.iterator(), batch_size):
+            # Диапазон захватывает и id удаленных постов перед пачкой.
+            with transaction.atomic():
+                cursor.execute(DELETE_ROWS, [start, chunk[-1]])
+                cursor.execute(insert, [start, chunk[-1]])
+            start = chunk[-1] + 1
+            total += len(chunk)
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid >= %s', [start])
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
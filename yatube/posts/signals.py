@@ -0,0 +1,236 @@
+import json
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, stats, thumbnails, timeline
+from .models import (AuthorStats, Comment, Follow, Group, Post,
+                     TimelineEntry, User)
+from .tasks import run_in_background
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+def feed_namespaces(post):
+    namespaces = [
+        caching.INDEX,
+        caching.PROFILE.format(username=post.author.username),
+    ]
+    if post.group:
+        namespaces.append(caching.GROUP.format(slug=post.group.slug))
+    return namespaces
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, 'posts_count', 1)
+        caching.adjust_counts(1, *feed_namespaces(instance))
+        run_in_background(timeline.fan_out, instance.pk)
+        return
+    reassign_post(instance)
+    old_slug = getattr(instance, '_old_group_slug', None)
+    new_slug = instance.group and instance.group.slug
+    if old_slug != new_slug:
+        if old_slug:
+            caching.adjust_counts(-1, caching.GROUP.format(slug=old_slug))
+        if new_slug:
+            caching.adjust_counts(1, caching.GROUP.format(slug=new_slug))
+
+
+def reassign_post(post):
+    """Переносит счетчики и ленты подписок к новому автору поста."""
+    old_author = getattr(post, '_old_author', None)
+    if not old_author or old_author[0] == post.author_id:
+        return
+    old_id, old_username = old_author
+    stats.bump(old_id, 'posts_count', -1)
+    stats.bump(post.author_id, 'posts_count', 1)
+    caching.adjust_counts(-1, caching.PROFILE.format(username=old_username))
+    caching.adjust_counts(
+        1, caching.PROFILE.format(username=post.author.username))
+    run_in_background(timeline.reassign, post.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_timeline_readers(sender, instance, **kwargs):
+    # Каскад удалит записи лент подписок без их сигналов.
+    instance._timeline_readers = set(TimelineEntry.objects.filter(
+        post=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'posts_count', -1)
+    caching.adjust_counts(-1, *feed_namespaces(instance))
+    timeline.invalidate(getattr(instance, '_timeline_readers', ()))
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_author(sender, instance, raw=False, **kwargs):
+    instance._old_author = None
+    if instance.pk and not raw:
+        instance._old_author = Comment.objects.filter(
+            pk=instance.pk).values_list('author', 'author__username').first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, 'comments_count', 1)
+        return
+    old_author = getattr(instance, '_old_author', None)
+    if old_author and old_author[0] != instance.author_id:
+        stats.bump(old_author[0], 'comments_count', -1)
+        stats.bump(instance.author_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, 'followers_count', 1)
+        stats.bump(instance.user_id, 'following_count', 1)
+        run_in_background(
+            timeline.backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'followers_count', -1)
+    stats.bump(instance.user_id, 'following_count', -1)
+    run_in_background(timeline.prune, instance.user_id, instance.author_id)
+
+
+def post_namespaces(post):
+    namespaces = feed_namespaces(post)
+    namespaces.append(caching.POST.format(post_id=post.pk))
+    old_slug = getattr(post, '_old_group_slug', None)
+    if old_slug:
+        namespaces.append(caching.GROUP.format(slug=old_slug))
+    old_author = getattr(post, '_old_author', None)
+    if old_author and old_author[0] != post.author_id:
+        namespaces.append(caching.PROFILE.format(username=old_author[1]))
+    return namespaces
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._old_group_slug = old_image = instance._old_author = None
+    instance._old_variants = old_variants = None
+    if instance.pk and not raw:
+        row = Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image', 'image_variants', 'author',
+            'author__username').first()
+        if row is not None:
+            instance._old_group_slug, old_image, old_variants = row[:3]
+            instance._old_author = row[3:]
+    if not raw and instance.image.name != old_image:
+        instance.image_variants = ''
+        # Варианты прежней картинки удаляются после записи поста.
+        instance._old_variants = old_variants
+
+
+@receiver(post_save, sender=Post)
+def delete_replaced_variants(sender, instance, **kwargs):
+    if getattr(instance, '_old_variants', None):
+        thumbnails.delete_variants(
+            instance.image.storage, json.loads(instance._old_variants))
+        instance._old_variants = None
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_variants(sender, instance, **kwargs):
+    thumbnails.delete_variants(instance.image.storage, instance.variants)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    caching.bump(*post_namespaces(instance))
+
+
+@receiver(post_save, sender=Post)
+def generate_thumbnails(sender, instance, raw=False, **kwargs):
+    # Превью создаются заранее, чтобы не задерживать просмотр ленты.
+    if instance.image and not instance.image_variants and not raw:
+        thumbnails.enqueue(instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    instance._old_slug = None
+    if instance.pk and not raw:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    # Заголовок группы выводится в карточках ленты и профилей авторов.
+    authors = User.objects.filter(posts__group=instance).values_list(
+        'username', flat=True).distinct()
+    slugs = {instance.slug, getattr(instance, '_old_slug', None)} - {None}
+    caching.bump(
+        caching.INDEX,
+        *(caching.GROUP.format(slug=slug) for slug in slugs),
+        *(caching.PROFILE.format(username=username) for username in authors)
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, **kwargs):
+    instance._old_username = None
+    if instance.pk and not raw:
+        instance._old_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, update_fields=None,
+                          **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    usernames = {instance.username, instance._old_username} - {None}
+    namespaces = [
+        caching.PROFILE.format(username=username) for username in usernames
+    ]
+    if instance.posts.exists():
+        groups = Group.objects.filter(posts__author=instance).values_list(
+            'slug', flat=True).distinct()
+        namespaces.append(caching.INDEX)
+        namespaces.extend(caching.GROUP.format(slug=slug) for slug in groups)
+    caching.bump(*namespaces)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    namespaces = [
+        caching.POST.format(post_id=instance.post_id),
+        caching.PROFILE.format(username=instance.author.username),
+    ]
+    old_author = getattr(instance, '_old_author', None)
+    if old_author and old_author[0] != instance.author_id:
+        namespaces.append(caching.PROFILE.format(username=old_author[1]))
+    caching.bump(*namespaces)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    caching.bump(
+        caching.PROFILE.format(username=instance.author.username),
+        caching.PROFILE.format(username=instance.user.username),
+    )
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User
+from .timeline import chunked
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def bump(user_id, counter, delta):
+    """Атомарно меняет счетчик пользователя на delta.
+
+    Отсутствующую строку не создает: пользователь может удаляться
+    в этой же транзакции. Такие расхождения исправляет recount.
+    """
+    AuthorStats.objects.filter(user_id=user_id).update(
+        **{counter: Greatest(F(counter) + delta, 0)})
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(users=None, batch_size=500):
+    """Пересчитывает счетчики по данным и возвращает число исправлений."""
+    if users is None:
+        users = User.objects.all()
+    users = users.order_by('pk').annotate(**{
+        counter: _count(model, field)
+        for counter, (model, field) in COUNTERS.items()
+    }).values('pk', *COUNTERS)
+    fixed = 0
+    for batch in chunked(users.iterator(), batch_size):
+        with transaction.atomic():
+            current = AuthorStats.objects.select_for_update().in_bulk(
+                [row['pk'] for row in batch])
+            changed, missing = [], []
+            for row in batch:
+                stats = current.get(row['pk'])
+                if stats is None:
+                    missing.append(AuthorStats(
+                        user_id=row['pk'],
+                        **{counter: row[counter] for counter in COUNTERS}))
+                    continue
+                if any(getattr(stats, counter) != row[counter]
+                       for counter in COUNTERS):
+                    for counter in COUNTERS:
+                        setattr(stats, counter, row[counter])
+                    changed.append(stats)
+            AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+            AuthorStats.objects.bulk_update(changed, COUNTERS)
+            fixed += len(missing) + len(changed)
+    return fixed
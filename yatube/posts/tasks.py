@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Сколько первых задач очереди пробовать захватить за один проход.
+CLAIM_CANDIDATES = 10
+
+_stop = threading.Event()
+
+
+def run_in_background(func, *args, queue='default', priority=0):
+    """Ставит func(*args) в очередь queue, ее выполнит runworker.
+
+    Задача пишется в той же транзакции, что и данные, поэтому воркер
+    увидит ее только после коммита. func должна импортироваться по
+    имени, а args - сериализоваться в JSON. При TASKS_ALWAYS_EAGER
+    задача выполняется сразу, в текущем потоке.
+    """
+    if settings.TASKS_ALWAYS_EAGER:
+        func(*args)
+        return
+    Job.objects.create(
+        queue=queue,
+        func=f'{func.__module__}.{func.__qualname__}',
+        args=json.dumps(args),
+        priority=priority,
+        available_at=timezone.now(),
+    )
+
+
+def claim(worker, queues=None):
+    """Захватывает самую приоритетную доступную задачу или возвращает None.
+
+    Строка захватывается условным UPDATE по числу попыток: из воркеров,
+    выбравших одну задачу, ее получит только первый. Так работает и
+    SQLite, где нет SELECT ... FOR UPDATE. Задача, исчерпавшая
+    TASKS_MAX_ATTEMPTS (ее воркер упал, не дойдя до perform), получает
+    статус ошибки вместо нового захвата.
+    """
+    now = timezone.now()
+    jobs = Job.objects.filter(status=Job.QUEUED, available_at__lte=now)
+    if queues:
+        jobs = jobs.filter(queue__in=queues)
+    candidates = jobs.order_by('-priority', 'available_at').values_list(
+        'pk', 'attempts')[:CLAIM_CANDIDATES]
+    for pk, attempts in candidates:
+        if attempts >= settings.TASKS_MAX_ATTEMPTS:
+            Job.objects.filter(
+                pk=pk, status=Job.QUEUED, attempts=attempts
+            ).update(
+                status=Job.FAILED,
+                worker='',
+                error=f'Воркер не завершил задачу за {attempts} попыток',
+            )
+            continue
+        claimed = Job.objects.filter(
+            pk=pk, status=Job.QUEUED, attempts=attempts, available_at__lte=now
+        ).update(
+            attempts=attempts + 1,
+            worker=worker,
+            available_at=now + timedelta(
+                seconds=settings.TASKS_VISIBILITY_TIMEOUT),
+        )
+        if claimed:
+            return Job.objects.filter(pk=pk).first()
+    return None
+
+
+def held(job):
+    """Задача, если ее не перехватил другой воркер."""
+    return Job.objects.filter(
+        pk=job.pk, worker=job.worker, attempts=job.attempts)
+
+
+def extend_lease(job):
+    """Отодвигает таймаут видимости задачи, пока ее держит этот воркер.
+
+    Возвращает False, если задачу уже забрал другой воркер.
+    """
+    return bool(held(job).update(available_at=timezone.now() + timedelta(
+        seconds=settings.TASKS_VISIBILITY_TIMEOUT)))
+
+
+def _heartbeat(job, finished):
+    # Продлевает захват втрое чаще таймаута: долгие задачи (массовые
+    # действия, импорт, пересборка лент) не достаются второму воркеру.
+    try:
+        while not finished.wait(settings.TASKS_VISIBILITY_TIMEOUT / 3):
+            try:
+                if not extend_lease(job):
+                    logger.warning('Задачу %s забрал другой воркер', job)
+                    return
+            except OperationalError:
+                logger.warning('Не удалось продлить задачу %s', job)
+    finally:
+        connection.close()
+
+
+def perform(job):
+    """Выполняет захваченную задачу: удаляет ее или планирует повтор.
+
+    Пока задача выполняется, фоновый поток продлевает ее захват.
+    Итог записывается, только если задача все еще за этим воркером.
+    """
+    finished = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job, finished), daemon=True)
+    heartbeat.start()
+    try:
+        import_string(job.func)(*json.loads(job.args))
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        changes = {'error': traceback.format_exc(), 'worker': ''}
+        if job.attempts >= settings.TASKS_MAX_ATTEMPTS:
+            changes['status'] = Job.FAILED
+        else:
+            delay = settings.TASKS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            changes['available_at'] = (
+                timezone.now() + timedelta(seconds=delay))
+        held(job).update(**changes)
+        return False
+    finally:
+        finished.set()
+        heartbeat.join()
+    held(job).delete()
+    return True
+
+
+def stop():
+    """Просит work закончить после текущей задачи."""
+    _stop.set()
+
+
+def work(queues=None, once=False):
+    """Выполняет задачи очередей queues, пока не вызван stop.
+
+    С once возвращается, когда доступных задач не осталось. Возвращает
+    число выполненных задач.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    done = 0
+    while not _stop.is_set():
+        try:
+            job = claim(worker, queues)
+        except OperationalError:
+            # SQLite занят записью другого процесса.
+            logger.warning('Очередь задач заблокирована', exc_info=True)
+            _stop.wait(settings.TASKS_POLL_INTERVAL)
+            continue
+        if job is None:
+            if once:
+                break
+            close_old_connections()
+            _stop.wait(settings.TASKS_POLL_INTERVAL)
+            continue
+        done += perform(job)
+    return done
@@ -0,0 +1,11 @@
+from django import template
+
+from ..thumbnails import get_post_picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(post):
+    """Значения srcset и src картинки поста или None, пока их нет."""
+    return get_post_picture(post)
@@ -0,0 +1,66 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост номер {i}')
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        """Списки открываются без полного подсчета строк таблицы."""
+        for model in ('post', 'comment', 'follow', 'job'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist'), {'q': 'x'})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'всего')
+
+    def test_post_search_uses_index(self):
+        """Поиск постов в админке идет по полнотекстовому индексу."""
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'номер 1'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.posts[1]])
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'номер'})
+        self.assertEqual(
+            set(response.context['cl'].result_list), set(self.posts))
+
+    def test_comment_search_by_author(self):
+        """Комментарии ищутся по точному имени автора."""
+        url = reverse('admin:posts_comment_changelist')
+        self.assertEqual(
+            self.client.get(url, {'q': 'author'}).context['cl'].result_count,
+            1)
+        self.assertEqual(
+            self.client.get(url, {'q': 'auth'}).context['cl'].result_count, 0)
+
+    @override_settings(ADMIN_COUNT_LIMIT=2)
+    def test_count_limited(self):
+        """Подсчет строк останавливается на ADMIN_COUNT_LIMIT."""
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        paginator = response.context['cl'].paginator
+        self.assertEqual(paginator.count, 2)
+        self.assertTrue(paginator.estimated)
+        self.assertContains(response, '2+ ')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'номер'})
+        self.assertContains(response, '2+', count=2)
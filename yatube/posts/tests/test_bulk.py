@@ -0,0 +1,105 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import bulk, tasks
+from ..models import (BulkAction, Comment, Follow, Group, Post,
+                      TimelineEntry, User)
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False, BULK_ACTION_BATCH_SIZE=2)
+class BulkActionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(
+                post=post, author=self.author, text='Комментарий')
+        tasks.work(once=True)
+
+    def run_action(self, model, action, rows=None, **data):
+        response = self.client.post(
+            reverse(f'admin:posts_{model}_changelist'), {
+                'action': action,
+                '_selected_action': [
+                    row.pk for row in rows or self.posts],
+                **data,
+            })
+        self.assertEqual(response.status_code, 302)
+        return tasks.work(once=True)
+
+    def test_sync_delete_removed(self):
+        """Синхронного delete_selected в списках нет."""
+        for model in ('post', 'comment'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist'))
+                self.assertNotContains(response, 'delete_selected')
+                self.assertContains(response, 'delete_in_background')
+
+    def test_delete_posts(self):
+        """Посты удаляются воркером вместе с комментариями и лентами."""
+        self.assertEqual(TimelineEntry.objects.count(), 5)
+        self.run_action('post', 'delete_in_background')
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        bulk_action = BulkAction.objects.get()
+        self.assertEqual(
+            (bulk_action.done, bulk_action.total, bulk_action.status),
+            (5, 5, BulkAction.DONE))
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.author.stats.comments_count, 0)
+
+    def test_move_posts(self):
+        """Посты переносятся в группу по slug."""
+        self.run_action('post', 'move_to_group', group='group')
+        self.assertEqual(self.group.posts.count(), 5)
+
+    def test_unknown_target(self):
+        """Неизвестная группа не ставит действие в очередь."""
+        self.run_action('post', 'move_to_group', group='missing')
+        self.assertFalse(BulkAction.objects.exists())
+
+    def test_reassign_posts(self):
+        """Смена автора переносит счетчики и ленты подписок."""
+        self.run_action('post', 'reassign_author', author='other')
+        tasks.work(once=True)
+        self.assertEqual(self.other.posts.count(), 5)
+        self.author.stats.refresh_from_db()
+        self.other.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.other.stats.posts_count, 5)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_reassign_comments(self):
+        """Смена автора комментариев поправляет счетчики."""
+        self.run_action(
+            'comment', 'reassign_author', Comment.objects.all(),
+            author='other')
+        self.other.stats.refresh_from_db()
+        self.assertEqual(self.other.stats.comments_count, 5)
+        self.assertEqual(self.other.comments.count(), 5)
+
+    def test_resume_after_crash(self):
+        """Действие продолжается с первой необработанной пачки."""
+        bulk_action = bulk.submit(
+            self.admin, Post.objects.all(), BulkAction.DELETE)
+        BulkAction.objects.filter(pk=bulk_action.pk).update(done=4)
+        tasks.work(once=True)
+        self.assertEqual(
+            list(Post.objects.all()), self.posts[3::-1])
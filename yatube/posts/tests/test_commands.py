@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands import explain_feeds
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExplainFeedsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.user_2 = User.objects.create_user(username='auth2')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Текст')
+        Follow.objects.create(user=cls.user, author=cls.user_2)
+
+    def test_explain_feeds_uses_indexes(self):
+        """Ленты профиля и группы читаются по составным индексам."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        plan = out.getvalue()
+        for index in (
+            'post_author_pub_date_idx',
+            'post_group_pub_date_idx',
+            'post_pub_date_id_idx',
+            'comment_post_created_idx',
+            'follow_user_author_idx',
+        ):
+            with self.subTest(index=index):
+                self.assertIn(index, plan)
+        self.assertIn('Полных сканирований', plan)
+
+    def test_cursor_scan_flagged(self):
+        """Проход индекса ленты с начала для страницы после курсора -
+        проблема, для первой страницы - нет."""
+        line = '--SCAN posts_post USING INDEX post_pub_date_id_idx'
+        self.assertTrue(explain_feeds.is_full_scan(line, cursor=True))
+        self.assertFalse(explain_feeds.is_full_scan(line))
+        self.assertFalse(explain_feeds.is_full_scan(
+            '--SEARCH posts_post USING INDEX post_pub_date_id_idx '
+            '(pub_date<?)', cursor=True))
@@ -0,0 +1,82 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import caching
+from ..models import Group, Post, User
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Война и мир')
+        cls.urls = (
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=[cls.group.slug]),
+            reverse('posts:group_atom', args=[cls.group.slug]),
+            reverse('posts:profile_rss', args=[cls.author.username]),
+            reverse('posts:profile_atom', args=[cls.author.username]),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """Ленты RSS и Atom содержат посты и ссылки на них."""
+        link = reverse('posts:post_detail', args=[self.post.pk])
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, 'Война и мир')
+                self.assertContains(response, link)
+                self.assertContains(response, 'Лев Толстой')
+
+    def test_conditional_and_invalidated(self):
+        """Опрос без изменений - 304, новый пост сбрасывает ленту."""
+        namespaces = (
+            caching.INDEX,
+            caching.GROUP.format(slug=self.group.slug),
+            caching.PROFILE.format(username=self.author.username),
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                # Last-Modified отдается, когда секунда записи прошла.
+                cache.set_many({
+                    caching.namespace_key(caching.MODIFIED_KEY, name):
+                    time.time() - 60 for name in namespaces}, None)
+                response = self.client.get(url)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                ).status_code, 304)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, 304)
+                Post.objects.create(
+                    author=self.author, group=self.group,
+                    text=f'Новый пост {url}')
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertContains(response, f'Новый пост {url}')
+
+    def test_unknown_group(self):
+        """Лента несуществующей группы - 404."""
+        response = self.client.get(reverse('posts:group_rss', args=['no']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_link_feeds(self):
+        """Страницы группы и автора ссылаются на свои ленты."""
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug]))
+        self.assertContains(response, self.urls[2])
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertContains(response, self.urls[4])
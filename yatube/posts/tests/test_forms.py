@@ -129,6 +129,24 @@ class PostFormsTests(TestCase):
             f'{IMAGE_FOLDER}{form_data["image"].name}'
         )
 
+    def test_create_post_rejects_large_image(self):
+        """Картинка больше пределов по байтам или пикселям отклоняется."""
+        cases = (
+            ({'POST_IMAGE_MAX_BYTES': len(IMAGE) - 1}, 'Файл больше'),
+            ({'POST_IMAGE_MAX_PIXELS': 1}, 'слишком большая'),
+        )
+        for limits, error in cases:
+            with self.subTest(limits=limits), self.settings(**limits):
+                response = self.authorized_client.post(POST_CREATE, data={
+                    'text': 'Пост с большой картинкой',
+                    'image': SimpleUploadedFile(
+                        'large.gif', IMAGE, 'image/gif'),
+                })
+                errors = response.context['form'].errors['image']
+                self.assertIn(error, errors[0])
+                self.assertFalse(
+                    Post.objects.filter(text='Пост с большой картинкой'))
+
     def test_create_post_page_show_correct_context(self):
         """Шаблон create_post для создания и редактирования поста сформирован
         с правильным контекстом."""
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(TEMP_DIR, 'media'), IMPORT_BATCH_SIZE=2)
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(TEMP_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_content(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_content', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты, комментарии и подписки из JSONL со своими датами."""
+        rows = [
+            {'type': 'follow', 'user': 'reader', 'author': 'author'},
+            *({'type': 'post', 'id': 100 + i, 'author': 'author',
+               'group': 'group', 'text': f'Пост {i}',
+               'pub_date': f'2020-01-0{i + 1}T10:00:00'} for i in range(3)),
+            {'type': 'comment', 'post': 100, 'author': 'reader',
+             'text': 'Комментарий', 'created': '2020-02-01T10:00:00'},
+            {'type': 'post', 'author': 'missing', 'text': 'Без автора'},
+            {'type': 'comment', 'post': 999, 'author': 'reader', 'text': '-'},
+        ]
+        path = self.write('content.jsonl', '\n'.join(map(json.dumps, rows)))
+        out, err = self.import_content(path)
+        self.assertEqual(
+            sorted(self.group.posts.values_list('pk', flat=True)),
+            [100, 101, 102])
+        self.assertEqual(Post.objects.get(pk=100).pub_date.year, 2020)
+        self.assertEqual(Comment.objects.get().created.month, 2)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(TimelineEntry.objects.count(), 3)
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 3)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertIn("'missing'", err)
+        self.assertIn('пропущено: 2', out)
+        self.assertIn('строк/с', out)
+
+    def test_source_dates_in_batches(self):
+        """Даты источника сохраняются у каждой строки пачки."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        rows = [
+            {'type': 'comment', 'post': post.pk, 'author': 'reader',
+             'text': f'Комментарий {month}',
+             'created': f'2020-{month:02}-01T10:00:00'}
+            for month in range(1, 6)
+        ]
+        path = self.write('comments.jsonl', '\n'.join(map(json.dumps, rows)))
+        self.import_content(path)
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', 'created__month')),
+            [(f'Комментарий {month}', month) for month in range(1, 6)])
+        self.assertTrue(
+            Comment._meta.get_field('created').auto_now_add)
+
+    def test_taken_id_skips_batch(self):
+        """Пачка с занятым id пропускается, импорт идет дальше."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        taken = Post.objects.create(author=self.author, text='Уже есть')
+        rows = [
+            {'type': 'post', 'id': taken.pk, 'author': 'author',
+             'text': 'Дубль'},
+            {'type': 'post', 'author': 'author', 'text': 'Соседний'},
+            *({'type': 'post', 'author': 'author', 'text': f'Новый {i}'}
+              for i in range(2)),
+        ]
+        path = self.write('posts.jsonl', '\n'.join(map(json.dumps, rows)))
+        out, err = self.import_content(path)
+        self.assertIn('Пачка post из 2 строк не записана', err)
+        self.assertIn('пропущено: 2', out)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Новый 0', 'Новый 1', 'Уже есть'])
+        # id, назначенные базой, попали в ленты подписчиков.
+        self.assertEqual(sorted(TimelineEntry.objects.filter(
+            user=self.reader).values_list('post__text', flat=True)),
+            ['Новый 0', 'Новый 1', 'Уже есть'])
+
+    def test_import_csv_with_images(self):
+        """CSV с копированием картинок и созданием авторов."""
+        os.makedirs(os.path.join(TEMP_DIR, 'source'), exist_ok=True)
+        with open(os.path.join(TEMP_DIR, 'source', 'a.gif'), 'wb') as file:
+            file.write(IMAGE)
+        path = self.write(
+            'posts.csv', 'author,text,image\nnew,Пост с картинкой,a.gif\n')
+        self.import_content(
+            path, '--type', 'post', '--create-missing',
+            '--media-from', os.path.join(TEMP_DIR, 'source'))
+        post = Post.objects.get(author__username='new')
+        self.assertTrue(post.image.name.startswith('posts/a'))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_csv_requires_type(self):
+        """Для CSV нужен тип строк."""
+        path = self.write('rows.csv', 'author,text\n')
+        with self.assertRaises(CommandError):
+            self.import_content(path)
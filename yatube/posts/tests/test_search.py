@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.war = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Война и мир: <князь> Андрей смотрит на небо')
+        cls.other = Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Заметки о погоде и небе над городом')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_search_by_text_author_and_group(self):
+        """Посты находятся по тексту, автору и заголовку группы."""
+        for query in ('андрей', 'Толстой', 'классика', 'княз'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query)[1], [self.war.pk])
+
+    def test_search_highlights_and_escapes(self):
+        """Совпадения выделены, остальной текст экранирован."""
+        response, found = self.found('Андрей')
+        self.assertContains(response, '<mark>Андрей</mark>')
+        self.assertContains(response, '&lt;князь&gt;')
+
+    def test_query_operators_are_plain_text(self):
+        """Синтаксис FTS5 в запросе не вызывает ошибок."""
+        for query in ('"', 'NEAR(', 'text:*', 'AND OR', '***'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке поста, автора, группы."""
+        self.war.text = 'Анна Каренина'
+        self.war.save()
+        self.assertEqual(self.found('андрей')[1], [])
+        self.assertEqual(self.found('каренина')[1], [self.war.pk])
+        self.group.title = 'Романы'
+        self.group.save()
+        self.author.last_name = 'Николаевич'
+        self.author.save()
+        self.assertEqual(self.found('романы')[1], [self.war.pk])
+        self.assertEqual(self.found('николаевич')[1], [self.war.pk])
+        Post.objects.filter(pk=self.war.pk).delete()
+        self.assertEqual(self.found('каренина')[1], [])
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_cursor_pagination(self):
+        """Страницы по курсору идут по рангу без повторов."""
+        posts = [
+            Post.objects.create(author=self.author, text='небо ' * i)
+            for i in range(1, 6)
+        ]
+        response, first = self.found('небо')
+        self.assertEqual(len(first), 2)
+        after = response.context['page_obj'].next_cursor
+        self.assertContains(response, '?q=%D0%BD%D0%B5%D0%B1%D0%BE&amp;after=')
+        seen = list(first)
+        while after:
+            response, page = self.found('небо', after=after)
+            seen.extend(page)
+            after = response.context['page_obj'].next_cursor
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(
+            set(seen), {self.war.pk, *(post.pk for post in posts)})
+        # Чаще встречается слово - выше пост.
+        self.assertEqual(seen[0], posts[-1].pk)
+        before = response.context['page_obj'].previous_cursor
+        self.assertEqual(self.found('небо', before=before)[1], seen[-4:-2])
+
+    def test_rebuild_command(self):
+        """rebuild_search_index заново заполняет индекс пачками."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+            cursor.execute(
+                f'INSERT INTO {search.TABLE} (rowid, text) VALUES (999, %s)',
+                ['андрей'])
+        self.assertEqual(self.found('андрей')[1], [])
+        out = StringIO()
+        call_command('rebuild_search_index', '--batch-size', '1', stdout=out)
+        self.assertIn('Проиндексировано постов: 2', out.getvalue())
+        cache.clear()
+        self.assertEqual(self.found('андрей')[1], [self.war.pk])
+        self.assertEqual(self.found('погоде')[1], [self.other.pk])
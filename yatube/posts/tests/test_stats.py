@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.user_2 = User.objects.create_user(username='auth2')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_signals(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.user_2, text='Текст')
+        follow = Follow.objects.create(user=self.user_2, author=self.user)
+        author, reader = self.stats(self.user), self.stats(self.user_2)
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(reader.comments_count, 1)
+        self.assertEqual(reader.following_count, 1)
+        follow.delete()
+        post.delete()
+        author, reader = self.stats(self.user), self.stats(self.user_2)
+        self.assertEqual(author.posts_count, 0)
+        self.assertEqual(author.followers_count, 0)
+        self.assertEqual(reader.comments_count, 0)
+        self.assertEqual(reader.following_count, 0)
+
+    def test_recount_fixes_drift(self):
+        """Команда recount исправляет разошедшиеся счетчики."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(3)
+        )
+        AuthorStats.objects.filter(user=self.user_2).delete()
+        for fixed in (2, 0):
+            with self.subTest(fixed=fixed):
+                out = StringIO()
+                call_command('recount', stdout=out)
+                self.assertIn(f'Исправлено счетчиков: {fixed}', out.getvalue())
+        self.assertEqual(self.stats(self.user).posts_count, 3)
+        self.assertEqual(self.stats(self.user_2).posts_count, 0)
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Job, User
+
+CALLS = []
+
+
+def record(*args):
+    CALLS.append(args)
+
+
+def fail():
+    raise ValueError('Ошибка задачи')
+
+
+@override_settings(
+    TASKS_ALWAYS_EAGER=False,
+    TASKS_MAX_ATTEMPTS=2,
+    QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class TasksTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_job_runs_and_is_deleted(self):
+        """Задача выполняется воркером и удаляется из очереди."""
+        tasks.run_in_background(record, 1, 'a')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(tasks.work(once=True), 1)
+        self.assertEqual(CALLS, [(1, 'a')])
+        self.assertFalse(Job.objects.exists())
+
+    def test_priority_and_queues(self):
+        """Сначала берутся приоритетные задачи, чужие очереди не трогаются."""
+        tasks.run_in_background(record, 'low')
+        tasks.run_in_background(record, 'high', priority=10)
+        tasks.run_in_background(record, 'other', queue='other')
+        tasks.work(queues=['default'], once=True)
+        self.assertEqual(CALLS, [('high',), ('low',)])
+        self.assertEqual(Job.objects.get().queue, 'other')
+
+    def test_claimed_job_is_invisible(self):
+        """Взятую задачу не получит другой воркер до таймаута видимости."""
+        tasks.run_in_background(record)
+        job = tasks.claim('first')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(tasks.claim('second'))
+        Job.objects.update(available_at=timezone.now())
+        self.assertEqual(tasks.claim('second').attempts, 2)
+
+    def test_lease_is_extended_by_owner_only(self):
+        """Воркер продлевает свою задачу и не трогает перехваченную."""
+        tasks.run_in_background(record)
+        job = tasks.claim('first')
+        Job.objects.update(available_at=timezone.now())
+        self.assertTrue(tasks.extend_lease(job))
+        self.assertGreater(Job.objects.get().available_at, timezone.now())
+        Job.objects.update(available_at=timezone.now())
+        tasks.claim('second')
+        self.assertFalse(tasks.extend_lease(job))
+        tasks.perform(job)
+        self.assertEqual(Job.objects.get().worker, 'second')
+
+    def test_failed_job_retried_then_marked_failed(self):
+        """Упавшая задача повторяется позже, после лимита - ошибка."""
+        tasks.run_in_background(fail)
+        with self.assertLogs('posts.tasks', 'ERROR'):
+            tasks.work(once=True)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertIn('Ошибка задачи', job.error)
+        Job.objects.update(
+            available_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs('posts.tasks', 'ERROR'):
+            tasks.work(once=True)
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_abandoned_job_marked_failed(self):
+        """Задачу, чей воркер падал каждую попытку, не берут снова."""
+        tasks.run_in_background(record)
+        for worker in ('first', 'second'):
+            tasks.claim(worker)
+            Job.objects.update(available_at=timezone.now())
+        self.assertIsNone(tasks.claim('third'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_runworker_command(self):
+        """runworker --once выполняет доступные задачи."""
+        tasks.run_in_background(record, 'command')
+        out = StringIO()
+        call_command('runworker', '--once', stdout=out)
+        self.assertEqual(CALLS, [('command',)])
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+
+    @override_settings(EMAIL_BACKEND='core.mail.QueuedEmailBackend')
+    def test_mail_sent_by_worker(self):
+        """Письма отправляются воркером, а не в запросе."""
+        mail.send_mail('Тема', 'Текст', 'from@example.com', ['to@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        tasks.work(once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
+
+    def test_admin_shows_queues(self):
+        """Админка показывает глубину очередей."""
+        tasks.run_in_background(record, queue='images')
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_job_changelist'))
+        self.assertEqual(response.context['queues'][0]['ready'], 1)
+        self.assertContains(response, 'images')
@@ -0,0 +1,144 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'img/thumbnail.svg'
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', IMAGE, 'image/gif'),
+        )
+
+    def test_variants_generated_on_save(self):
+        """Варианты картинки создаются при сохранении поста."""
+        post = self.create_post()
+        post.refresh_from_db()
+        self.assertEqual(
+            set(post.variants), set(thumbnails.available_formats()))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertNotContains(response, PLACEHOLDER)
+        width, path = post.variants['jpeg'][0]
+        self.assertContains(response, f'{settings.MEDIA_URL}{path} {width}w')
+
+    def test_variants_deleted_with_image(self):
+        """Варианты удаляются при замене картинки и удалении поста."""
+        post = self.create_post()
+        post.refresh_from_db()
+        storage = post.image.storage
+        old = [path for width, path in post.variants['jpeg']]
+        post.image = SimpleUploadedFile('other.gif', IMAGE, 'image/gif')
+        post.save()
+        post.refresh_from_db()
+        new = [path for width, path in post.variants['jpeg']]
+        self.assertFalse(any(storage.exists(path) for path in old))
+        self.assertTrue(all(storage.exists(path) for path in new))
+        post.delete()
+        self.assertFalse(any(storage.exists(path) for path in new))
+
+    def test_variants_normalized(self):
+        """Варианты повернуты по EXIF, без метаданных и не больше
+        исходника."""
+        image = Image.new('RGB', (800, 400), 'red')
+        image.paste('blue', (400, 0, 800, 400))
+        exif = Image.Exif()
+        exif[ORIENTATION] = 3
+        content = io.BytesIO()
+        image.save(content, 'JPEG', exif=exif.tobytes())
+        content.seek(0)
+        with self.settings(POST_IMAGE_WIDTHS=(320, 640, 960)):
+            variants = thumbnails.render_variants(content)
+        self.assertEqual(
+            sorted({width for name, width, data in variants}), [320, 640])
+        for name, width, data in variants:
+            with self.subTest(name=name, width=width):
+                variant = Image.open(io.BytesIO(data))
+                self.assertEqual(
+                    variant.size, (width, round(width / 960 * 339)))
+                self.assertNotIn('exif', variant.info)
+                # Поворот на 180 градусов: синяя половина стала левой.
+                red, green, blue = variant.convert('RGB').getpixel((5, 5))
+                self.assertGreater(blue, red)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_original_stripped(self):
+        """Фоновая задача заменяет оригинал копией без EXIF, повернутой
+        по нему; запрос картинку не декодирует."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        exif[MAKE] = 'Камера'
+        content = io.BytesIO()
+        Image.new('RGB', (80, 40), 'red').save(
+            content, 'JPEG', exif=exif.tobytes())
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с фотографией',
+            image=SimpleUploadedFile(
+                'photo.jpg', content.getvalue(), 'image/jpeg'),
+        )
+        uploaded = post.image.name
+        with post.image.open('rb') as file:
+            self.assertIn('exif', Image.open(file).info)
+        thumbnails.generate(post.pk)
+        post.refresh_from_db()
+        storage = post.image.storage
+        self.assertNotEqual(post.image.name, uploaded)
+        self.assertFalse(storage.exists(uploaded))
+        self.assertTrue(post.variants)
+        with post.image.open('rb') as file:
+            original = Image.open(file)
+            self.assertEqual(original.size, (40, 80))
+            self.assertNotIn('exif', original.info)
+            self.assertEqual(dict(original.getexif()), {})
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_placeholder_until_generated(self):
+        """Пока превью в очереди, страницы выводят заглушку."""
+        post = self.create_post()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), PLACEHOLDER)
+        post.refresh_from_db()
+        self.assertEqual(post.variants, {})
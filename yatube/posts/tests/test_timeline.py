@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import tasks, timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def feed(self):
+        return list(
+            self.reader.timeline.for_feed().values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает ее."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post.id])
+        follow.delete()
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в начало ленты подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed(), [post.id, self.old_post.id])
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(entry.author, self.author)
+
+    def test_rebuild_matches_incremental_timeline(self):
+        """Пересборка дает ту же ленту, что и сигналы."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Новый пост')
+        expected = self.feed()
+        timeline.rebuild()
+        self.assertEqual(self.feed(), expected)
+
+    def test_deleted_post_leaves_feed_count(self):
+        """Удаление поста сбрасывает число постов ленты подписчика."""
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}')
+            for i in range(settings.POSTS_PER_PAGE))
+        timeline.rebuild()
+        self.client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        paginator = self.client.get(url).context['page_obj'].paginator
+        self.assertEqual(paginator.count, settings.POSTS_PER_PAGE + 1)
+        Post.objects.get(pk=self.old_post.pk).delete()
+        paginator = self.client.get(url).context['page_obj'].paginator
+        self.assertEqual(paginator.count, settings.POSTS_PER_PAGE)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_fan_out_changes_etag(self):
+        """Раскладка в фоне меняет ETag ленты, открытой до нее."""
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        tasks.work(once=True)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        etag = self.client.get(url)['ETag']
+        tasks.work(once=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(post, response.context['page_obj'].object_list)
@@ -1,13 +1,21 @@
+import math
 import shutil
 import tempfile
+import time
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 
+from .. import caching, timeline
 from ..models import Group, Post, User, Follow
+from ..paginators import encode_cursor
 
 TEST_USERNAME = 'test_username'
 TEST_USERNAME_2 = 'test_username_2'
@@ -74,6 +82,9 @@ class PostPagesTest(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_correct_template_context(self):
         """Шаблоны сформированы с правильным контекстом."""
         cache.clear()
@@ -134,6 +145,7 @@ class PostPagesTest(TestCase):
             )
             for i in range(settings.POSTS_PER_PAGE + 3)
         )
+        timeline.rebuild()
         pages = [
             [INDEX, settings.POSTS_PER_PAGE],
             [GROUP_LIST, settings.POSTS_PER_PAGE],
@@ -149,15 +161,232 @@ class PostPagesTest(TestCase):
                 response = self.authorized_client_2.get(page)
                 self.assertEqual(len(response.context['page_obj']), posts)
 
-    def test_cache_index(self):
-        """Проверка кэша на главной странице."""
-        response_1 = self.authorized_client.get(INDEX)
-        Post.objects.all().delete
-        response_2 = self.authorized_client.get(INDEX)
-        self.assertEqual(response_1.content, response_2.content)
+    def test_feed_query_budget(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        Post.objects.all().delete()
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                group=self.group,
+                text=f'Тестовый пост {i}',
+            )
+            for i in range(settings.POSTS_PER_PAGE)
+        )
+        timeline.rebuild()
+        budgets = (
+            (INDEX, self.client, 2),
+            (GROUP_LIST, self.client, 3),
+            (PROFILE, self.client, 3),
+            (FOLLOW, self.authorized_client_2, 4),
+        )
+        for url, client, budget in budgets:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    client.get(url)
+
+    def test_elided_page_range(self):
+        """Паджинатор выводит края и окрестность текущей страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Тестовый пост {i}')
+            for i in range(settings.POSTS_PER_PAGE * 20 - 1)
+        )
+        response = self.client.get(INDEX, {'page': 10})
+        self.assertEqual(
+            response.context['page_obj'].elided_page_range,
+            [1, 2, '…', 7, 8, 9, 10, 11, 12, 13, '…', 19, 20]
+        )
+        self.assertContains(response, '?page=', count=14)
+
+    def test_paginator_count_cache(self):
+        """Число постов берется из кэша и поправляется при записи."""
+        paginator = self.client.get(GROUP_LIST).context['page_obj'].paginator
+        self.assertEqual(paginator.count, 1)
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        with CaptureQueriesContext(connection) as queries:
+            paginator = self.client.get(
+                GROUP_LIST).context['page_obj'].paginator
+            self.assertEqual(paginator.count, 2)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+
+    @override_settings(POSTS_COUNT_ESTIMATE_LIMIT=settings.POSTS_PER_PAGE)
+    def test_paginator_estimated_count(self):
+        """Оценочный подсчет ограничивает число страниц."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Тестовый пост {i}')
+            for i in range(settings.POSTS_PER_PAGE * 2)
+        )
+        response = self.client.get(INDEX)
+        paginator = response.context['page_obj'].paginator
+        self.assertTrue(paginator.estimated)
+        self.assertEqual(paginator.num_pages, 1)
+        self.assertContains(response, '1+ страниц')
+        # Удаление не превращает оценку в точное число.
+        Post.objects.latest('pk').delete()
+        paginator = self.client.get(INDEX).context['page_obj'].paginator
+        self.assertTrue(paginator.estimated)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация проходит ленту без пропусков и повторов."""
         cache.clear()
-        response_3 = self.authorized_client.get(INDEX)
-        self.assertNotEqual(response_1.content, response_3.content)
+        Post.objects.all().delete()
+        Post.objects.bulk_create(
+            Post(
+                author=self.user,
+                group=self.group,
+                text=f'Тестовый пост {i}',
+            )
+            for i in range(settings.POSTS_PER_PAGE + 3)
+        )
+        timeline.rebuild()
+        for url in (GROUP_LIST, PROFILE, FOLLOW):
+            with self.subTest(url=url):
+                with self.settings(POSTS_CURSOR_PAGINATION=True):
+                    page_1 = self.authorized_client_2.get(
+                        url).context['page_obj']
+                self.assertEqual(len(page_1), settings.POSTS_PER_PAGE)
+                self.assertFalse(page_1.has_previous())
+                self.assertTrue(page_1.has_next())
+                page_2 = self.authorized_client_2.get(
+                    url, {'after': page_1.next_cursor}).context['page_obj']
+                self.assertEqual(len(page_2), 3)
+                self.assertFalse(page_2.has_next())
+                back = self.authorized_client_2.get(
+                    url, {'before': page_2.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(page_1))
+                self.assertFalse(back.has_previous())
+                ids = [post.id for post in list(page_1) + list(page_2)]
+                self.assertEqual(
+                    ids,
+                    list(Post.objects.order_by(
+                        '-pub_date', 'id').values_list('id', flat=True))
+                )
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_uses_index_range(self):
+        """Страница после курсора ищется по диапазону индекса, а не
+        проходом индекса с начала."""
+        timeline.rebuild()
+        cursor = encode_cursor(self.post)
+        for url in (INDEX, GROUP_LIST, PROFILE, FOLLOW):
+            for direction in ('after', 'before'):
+                with self.subTest(url=url, direction=direction):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        self.authorized_client_2.get(url, {direction: cursor})
+                    feed = [
+                        query['sql'] for query in queries.captured_queries
+                        if '"pub_date" <' in query['sql']
+                        or '"pub_date" >' in query['sql']]
+                    self.assertTrue(feed)
+                    with connection.cursor() as db:
+                        db.execute(f'EXPLAIN QUERY PLAN {feed[0]}')
+                        plan = [row[-1] for row in db.fetchall()]
+                    self.assertFalse(
+                        [line for line in plan if line.startswith('SCAN')],
+                        plan)
+
+    def test_cache_index(self):
+        """Ленты кэшируются до записи и сразу обновляются после нее."""
+        for url in (INDEX, GROUP_LIST, PROFILE):
+            with self.subTest(url=url):
+                response_1 = self.authorized_client.get(url)
+                # Из кэша: только сессия и пользователь.
+                with self.assertNumQueries(2):
+                    response_2 = self.authorized_client.get(url)
+                self.assertEqual(response_1.content, response_2.content)
+                Post.objects.create(
+                    author=self.user,
+                    group=self.group,
+                    text=f'Новый пост {url}',
+                )
+                response_3 = self.authorized_client.get(url)
+                self.assertNotEqual(response_1.content, response_3.content)
+                self.assertContains(response_3, f'Новый пост {url}')
+
+    def test_cache_invalidated_by_group_and_author(self):
+        """Изменение группы или автора сбрасывает ленты с их постами."""
+        for url in (INDEX, PROFILE):
+            self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новый заголовок'
+        group.save()
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        self.assertContains(self.client.get(INDEX), 'Новый заголовок')
+        self.assertContains(self.client.get(INDEX), 'Новое имя')
+        self.assertContains(self.client.get(PROFILE), 'Новый заголовок')
+
+    def test_post_card_cache(self):
+        """Карточки берутся из кэша и перерисовываются после правки."""
+        card = 'posts/includes/post.html'
+        self.assertTemplateUsed(self.client.get(INDEX), card)
+        caching.bump(caching.INDEX)
+        self.assertTemplateNotUsed(self.client.get(INDEX), card)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(INDEX)
+        self.assertTemplateUsed(response, card)
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_conditional_get(self):
+        """Неизменившиеся страницы отвечают 304 без обращения к view."""
+        cases = (
+            (INDEX, self.authorized_client),
+            (GROUP_LIST, self.authorized_client),
+            (PROFILE, self.authorized_client),
+            (FOLLOW, self.authorized_client_2),
+            (self.POST_DETAIL, self.authorized_client),
+        )
+        for url, client in cases:
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                Post.objects.create(
+                    author=self.user,
+                    group=self.group,
+                    text=f'Новый пост {url}',
+                )
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_post_detail(self):
+        """Комментарий меняет ETag поста, чужой ETag не подходит."""
+        etag = self.authorized_client.get(self.POST_DETAIL)['ETag']
+        response = self.authorized_client_2.get(
+            self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Комментарий'},
+        )
+        response = self.authorized_client.get(
+            self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_conditional_get_last_modified(self):
+        """Анонимам отдается Last-Modified по времени последней записи,
+        когда секунда записи уже прошла."""
+        key = caching.namespace_key(caching.MODIFIED_KEY, caching.INDEX)
+        written = time.time() - 60.5
+        cache.set(key, written, None)
+        response = self.client.get(INDEX)
+        self.assertEqual(
+            response['Last-Modified'], http_date(math.ceil(written)))
+        response = self.client.get(
+            INDEX, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        cache.set(key, time.time(), None)
+        self.assertFalse(self.client.get(INDEX).has_header('Last-Modified'))
+        self.assertFalse(
+            self.authorized_client.get(INDEX).has_header('Last-Modified'))
 
     def test_user_follow(self):
         """Проверка подписки на пользователей."""
@@ -188,3 +417,15 @@ class PostPagesTest(TestCase):
                 author=self.user
             ).exists()
         )
+
+
+class CommitBumpTest(TransactionTestCase):
+    def test_bump_after_commit(self):
+        """Версия ленты меняется и при записи, и после коммита."""
+        author = User.objects.create_user(username='author')
+        versions = [caching.get_versions([caching.INDEX])[0]]
+        with transaction.atomic():
+            Post.objects.create(author=author, text='Пост')
+            versions.append(caching.get_versions([caching.INDEX])[0])
+        versions.append(caching.get_versions([caching.INDEX])[0])
+        self.assertEqual(len(set(versions)), 3)
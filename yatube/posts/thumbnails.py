@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import Post
+from .tasks import run_in_background
+
+# Размер карточки поста, как у прежнего превью 960x339.
+CARD_WIDTH = 960
+CARD_RATIO = CARD_WIDTH / 339
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+# Оригиналы этих форматов пересохраняются без метаданных.
+STRIPPED_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+ORIENTATION = 0x0112
+# Ключи Image.info с метаданными, которые не должны попасть на сайт.
+METADATA = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+VARIANT_NAME = 'posts/variants/{digest}-{width}w.{extension}'
+PENDING_KEY = 'posts:thumbnail:pending:{post_id}'
+# Сколько не ставить повторно задачу для поста без вариантов.
+PENDING_TIMEOUT = 60 * 5
+
+
+def available_formats():
+    """Форматы вариантов; WebP - если Pillow собран с libwebp."""
+    return [name for name in FORMATS if name != 'webp' or features.check(name)]
+
+
+def strip_metadata(file):
+    """Копия картинки без EXIF (в том числе GPS), XMP и комментариев.
+
+    Ориентация из EXIF применяется к пикселям, профиль ICC остается.
+    JPEG без поворота пересохраняется с прежними таблицами квантования,
+    чтобы не терять качество. Возвращает ContentFile или None, если
+    метаданных нет, формат не поддерживается, картинка анимирована или
+    больше предела. Картинка декодируется целиком, поэтому функция
+    вызывается только из фоновой задачи generate.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            if (image_format not in STRIPPED_FORMATS
+                    or getattr(image, 'is_animated', False)
+                    or image.width * image.height
+                    > settings.POST_IMAGE_MAX_PIXELS
+                    or not any(key in image.info for key in METADATA)):
+                return None
+            options = {'exif': b''}
+            if image.info.get('icc_profile'):
+                options['icc_profile'] = image.info['icc_profile']
+            if image_format == 'MPO':
+                image_format = 'JPEG'
+            if image.getexif().get(ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+                options['quality'] = 95
+            elif image_format == 'JPEG':
+                options['quality'] = 'keep' if image.format == 'JPEG' else 95
+            elif image_format == 'WEBP':
+                options['quality'] = 95
+            content = io.BytesIO()
+            image.save(content, image_format, **options)
+    except (OSError, UnidentifiedImageError):
+        return None
+    finally:
+        file.seek(0)
+    return ContentFile(content.getvalue())
+
+
+def render_variants(file):
+    """Режет картинку по пропорциям карточки и кодирует все ширины.
+
+    Ориентация из EXIF применяется к пикселям, а метаданные (EXIF,
+    ICC, комментарии) в варианты не попадают. Возвращает список
+    (формат, ширина, байты).
+    """
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    with Image.open(file) as image:
+        if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValueError(f'Картинка {image.size} больше предела')
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', (widths[-1], round(widths[-1] / CARD_RATIO)))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    width, height = image.size
+    if width / height > CARD_RATIO:
+        crop = round(height * CARD_RATIO)
+        box = ((width - crop) // 2, 0, (width + crop) // 2, height)
+    else:
+        crop = max(1, round(width / CARD_RATIO))
+        box = (0, (height - crop) // 2, width, (height + crop) // 2)
+    image = image.crop(box)
+    # Больше исходника не увеличиваем, но самый узкий вариант есть всегда.
+    widths = widths[:1] + [w for w in widths[1:] if w <= image.width]
+    variants = []
+    for width in widths:
+        resized = image.resize(
+            (width, max(1, round(width / CARD_RATIO))), Image.LANCZOS)
+        for name in available_formats():
+            image_format, options = FORMATS[name]
+            content = io.BytesIO()
+            resized.save(content, image_format, **options)
+            variants.append((name, width, content.getvalue()))
+    return variants
+
+
+def generate(post_id):
+    """Сохраняет варианты картинки поста и записывает их в пост.
+
+    Оригинал с метаданными заменяется копией без них: до этой задачи
+    он лежит в MEDIA_ROOT как загружен.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    storage = post.image.storage
+    try:
+        if not storage.exists(post.image.name):
+            return
+    except SuspiciousFileOperation:
+        return
+    with post.image.open('rb') as file:
+        rendered = render_variants(file)
+        stripped = strip_metadata(file)
+    if stripped is not None and not replace_original(post, stripped):
+        # Картинку успели заменить, новую обработает своя задача.
+        return
+    digest = hashlib.md5(post.image.name.encode()).hexdigest()
+    variants = {}
+    for name, width, content in rendered:
+        path = VARIANT_NAME.format(digest=digest, width=width, extension=name)
+        storage.delete(path)
+        path = storage.save(path, ContentFile(content))
+        variants.setdefault(name, []).append([width, path])
+    cache.delete(PENDING_KEY.format(post_id=post_id))
+    # Новое значение updated сбросит карточки с заглушкой. Если картинку
+    # успели заменить, pre_save очистит поле, и варианты удаляются.
+    post.image_variants = json.dumps(variants)
+    post.save(update_fields=['image_variants', 'updated'])
+    if not post.image_variants:
+        delete_variants(storage, variants)
+
+
+def replace_original(post, content):
+    """Сохраняет content вместо оригинала картинки post.
+
+    Файл пишется под новым именем, а поле меняется UPDATE с условием на
+    старое имя, мимо сигналов: pre_save принял бы это за новую
+    картинку. Возвращает False, если картинку поста уже заменили.
+    """
+    storage = post.image.storage
+    old_name = post.image.name
+    new_name = storage.save(old_name, content)
+    if not Post.objects.filter(pk=post.pk, image=old_name).update(
+            image=new_name):
+        storage.delete(new_name)
+        return False
+    storage.delete(old_name)
+    post.image.name = new_name
+    return True
+
+
+def delete_variants(storage, variants):
+    """Удаляет файлы вариантов {формат: [[ширина, путь], ...]}."""
+    for files in variants.values():
+        for width, path in files:
+            storage.delete(path)
+
+
+def enqueue(post_id):
+    if cache.add(PENDING_KEY.format(post_id=post_id), True, PENDING_TIMEOUT):
+        run_in_background(generate, post_id, queue='thumbnails')
+
+
+def get_post_picture(post):
+    """Значения srcset по форматам и src картинки поста или None.
+
+    В запросе картинка не обрабатывается: пока вариантов нет,
+    генерация ставится в очередь, а шаблон выводит заглушку.
+    """
+    if not post.image:
+        return None
+    variants = post.variants
+    if not variants:
+        enqueue(post.pk)
+        return None
+    storage = post.image.storage
+    picture = {
+        name: ', '.join(
+            f'{storage.url(path)} {width}w' for width, path in files)
+        for name, files in variants.items()
+    }
+    # Браузерам без srcset - вариант, ближайший к ширине карточки.
+    width, path = min(
+        variants['jpeg'], key=lambda variant: abs(variant[0] - CARD_WIDTH))
+    picture['src'] = storage.url(path)
+    return picture
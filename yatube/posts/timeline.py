@@ -0,0 +1,143 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import caching
+from .models import Follow, Post, TimelineEntry
+
+FILL_TIMELINE = '''
+    INSERT INTO posts_timelineentry (user_id, post_id, author_id, pub_date)
+    SELECT follow.user_id, post.id, post.author_id, post.pub_date
+    FROM posts_follow AS follow
+    INNER JOIN posts_post AS post ON post.author_id = follow.author_id
+'''
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def invalidate(user_ids):
+    """Сбрасывает кэш, ETag и число постов лент читателей user_ids."""
+    namespaces = [
+        caching.TIMELINE.format(user_id=user_id) for user_id in user_ids]
+    caching.forget_counts(*namespaces)
+    caching.bump(*namespaces)
+
+
+def _write(entries):
+    # Каждая пачка сразу сбрасывает кэш и ETag своих читателей: иначе
+    # страница, закэшированная между post_save и раскладкой, жила бы
+    # без нового поста до FEED_CACHE_TIMEOUT.
+    for batch in chunked(entries, settings.TIMELINE_BATCH_SIZE):
+        with transaction.atomic():
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        invalidate({entry.user_id for entry in batch})
+
+
+def _delete(entries):
+    """Удаляет записи пачками и возвращает id их читателей."""
+    readers = set()
+    while True:
+        with transaction.atomic():
+            batch = list(entries.values_list('pk', 'user_id')[
+                :settings.TIMELINE_BATCH_SIZE])
+            if not batch:
+                break
+            TimelineEntry.objects.filter(
+                pk__in=[pk for pk, user_id in batch]).delete()
+        readers.update(user_id for pk, user_id in batch)
+    return readers
+
+
+def fan_out(post_id):
+    """Кладет новый пост в ленты всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    if post is None:
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True).order_by('pk').iterator()
+    _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers
+    )
+
+
+def fan_out_posts(posts):
+    """Кладет пачку новых постов в ленты подписчиков их авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(author_id__in=by_author).values_list(
+        'user_id', 'author_id').order_by('pk').iterator()
+    _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id, author_id in followers
+        for post in by_author[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту новой подписки все посты автора."""
+    follow = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    if not follow.exists():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date').order_by('pk').iterator()
+    _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    follow = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    if follow.exists():
+        return
+    _delete(TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id))
+    invalidate([user_id])
+
+
+def remove_posts(post_ids):
+    """Убирает посты из всех лент подписок пачками."""
+    invalidate(_delete(TimelineEntry.objects.filter(post_id__in=post_ids)))
+
+
+def reassign(post_id):
+    """Переносит пост в ленты подписчиков его нового автора."""
+    remove_posts([post_id])
+    fan_out(post_id)
+
+
+def rebuild():
+    """Пересобирает все ленты подписок одним INSERT ... SELECT."""
+    readers = set(TimelineEntry.objects.values_list('user_id', flat=True))
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(FILL_TIMELINE)
+    readers.update(Follow.objects.values_list('user_id', flat=True))
+    invalidate(readers)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше POST_IMAGE_MAX_BYTES.
+
+    В памяти держится только текущий кусок запроса. У слишком большого
+    файла содержимое отбрасывается, а size остается настоящим, чтобы
+    форма сообщила о превышении предела.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.file.seek(0)
+            self.file.truncate()
+            return
+        self.file.write(raw_data)
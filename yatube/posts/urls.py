@@ -1,10 +1,17 @@
 from django.urls import path
 
-from . import views
+from . import caching, feeds, views
 
 
 app_name = 'posts'
 
+
+def cached_feed(feed, namespace):
+    # Опрос читателями стоит 304 или попадания в кэш страниц.
+    return caching.conditional(namespace)(
+        caching.cache_feed(namespace)(feed))
+
+
 urlpatterns = [
     path('',
          views.index,
@@ -15,6 +22,30 @@ urlpatterns = [
     path('profile/<str:username>/',
          views.profile,
          name='profile'),
+    path('rss/',
+         cached_feed(feeds.PostsFeed(), caching.INDEX),
+         name='index_rss'),
+    path('atom/',
+         cached_feed(feeds.PostsAtomFeed(), caching.INDEX),
+         name='index_atom'),
+    path('group/<slug:slug>/rss/',
+         cached_feed(feeds.GroupPostsFeed(), caching.GROUP),
+         name='group_rss'),
+    path('group/<slug:slug>/atom/',
+         cached_feed(feeds.GroupPostsAtomFeed(), caching.GROUP),
+         name='group_atom'),
+    path('profile/<str:username>/rss/',
+         cached_feed(feeds.AuthorPostsFeed(), caching.PROFILE),
+         name='profile_rss'),
+    path('profile/<str:username>/atom/',
+         cached_feed(feeds.AuthorPostsAtomFeed(), caching.PROFILE),
+         name='profile_atom'),
+    path('search/',
+         views.search,
+         name='search'),
+    path('export/',
+         views.export,
+         name='export'),
     path('posts/<int:post_id>/',
          views.post_detail,
          name='post_detail'),
@@ -1,9 +1,26 @@
 from django.conf import settings
-from django.core.paginator import Paginator
 
+from .paginators import CachedCountPaginator, CursorPaginator
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+
+def get_page_context(queryset, request, id_field='pk', count_key=None):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before or (
+        settings.POSTS_CURSOR_PAGINATION and 'page' not in request.GET
+    ):
+        paginator = CursorPaginator(
+            queryset, settings.POSTS_PER_PAGE, id_field
+        )
+        return paginator.get_page(after=after, before=before)
+    paginator = CachedCountPaginator(
+        queryset,
+        settings.POSTS_PER_PAGE,
+        count_key=count_key,
+        estimate_limit=settings.POSTS_COUNT_ESTIMATE_LIMIT,
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.elided_page_range = list(paginator.get_elided_page_range(
+        page_obj.number, on_each_side=settings.POSTS_PAGES_ON_EACH_SIDE))
     return page_obj
@@ -1,24 +1,34 @@
+from urllib.parse import urlencode
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
 
+from . import caching, exporter, search as post_search
 from .forms import PostForm, CommentForm
 from .models import Post, Group, User, Follow
 from .utils import get_page_context
 
 
-@cache_page(20)
+@caching.conditional(caching.INDEX)
+@caching.cache_feed(caching.INDEX)
 def index(request):
-    page_obj = get_page_context(Post.objects.all(), request)
+    page_obj = get_page_context(
+        Post.objects.for_feed(), request, count_key=caching.INDEX)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@caching.conditional(caching.GROUP)
+@caching.cache_feed(caching.GROUP)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page_context(group.posts.all(), request)
+    page_obj = get_page_context(
+        group.posts.for_feed(), request,
+        count_key=caching.GROUP.format(slug=slug))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -26,9 +36,14 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@caching.conditional(caching.PROFILE)
+@caching.cache_feed(caching.PROFILE)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = get_page_context(author.posts.all(), request)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    page_obj = get_page_context(
+        author.posts.for_feed(), request,
+        count_key=caching.PROFILE.format(username=username))
     following = (
         request.user.is_authenticated
         and request.user != author
@@ -44,8 +59,24 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@caching.conditional(caching.INDEX)
+@caching.cache_feed(caching.INDEX)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = post_search.get_page(
+        query, request.GET.get('after'), request.GET.get('before'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@caching.conditional(caching.post_detail_namespaces)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     form = CommentForm()
     template = 'posts/post_detail.html'
     context = {
@@ -102,9 +133,12 @@ def post_edit(request, post_id):
 
 
 @login_required
+@caching.conditional(caching.INDEX, caching.TIMELINE)
 def follow_index(request):
-    page_obj = get_page_context(Post.objects.filter(
-        author__following__user=request.user), request)
+    page_obj = get_page_context(
+        request.user.timeline.for_feed(), request, id_field='post_id',
+        count_key=caching.TIMELINE.format(user_id=request.user.pk))
+    page_obj.object_list = [entry.post for entry in page_obj]
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -126,3 +160,24 @@ def profile_unfollow(request, username):
     )
     user_follower.delete()
     return redirect('posts:profile', username)
+
+
+@staff_member_required
+def export(request):
+    """Та же выгрузка, что export_content, потоком без буфера в памяти."""
+    types = request.GET.getlist('type') or exporter.TYPES
+    since = request.GET.get('since')
+    if since:
+        since = exporter.parse_since(since)
+        if since is None:
+            return HttpResponseBadRequest('Неверная дата since')
+    lines = exporter.export_lines(types, since)
+    filename = 'export.jsonl'
+    content_type = 'application/x-ndjson; charset=utf-8'
+    if request.GET.get('gzip'):
+        lines = exporter.gzip_chunks(lines)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,11 +34,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -48,7 +53,8 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, время рендера которых видит Server-Timing.
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -120,13 +126,51 @@ STATIC_URL = '/static/'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+# Чем отправляет письма воркер очереди задач.
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+# Сколько номеров страниц показывать по обе стороны от текущей.
+POSTS_PAGES_ON_EACH_SIDE = 3
+# Курсорная пагинация (?after=/?before=) вместо номеров страниц.
+POSTS_CURSOR_PAGINATION = False
+
+# Фоновые задачи: без отдельного воркера выполняются сразу в запросе.
+TASKS_ALWAYS_EAGER = DEBUG
+# Через сколько секунд взятая задача снова доступна, если воркер упал.
+TASKS_VISIBILITY_TIMEOUT = 60 * 5
+# Сколько раз выполнять задачу, прежде чем пометить ее ошибочной.
+TASKS_MAX_ATTEMPTS = 5
+# Пауза перед первым повтором, дальше удваивается.
+TASKS_RETRY_DELAY = 30
+# Как часто воркер проверяет пустую очередь, в секундах.
+TASKS_POLL_INTERVAL = 1
+# Размер пачки записей при заполнении лент подписок.
+TIMELINE_BATCH_SIZE = 500
+# Размер пачки постов при пересборке индекса поиска.
+SEARCH_BATCH_SIZE = 1000
+# Сколько строк массовое действие админки меняет в одной транзакции.
+BULK_ACTION_BATCH_SIZE = 100
+# Импорт контента: строк в пачке bulk_create и авторов/групп в кэше.
+IMPORT_BATCH_SIZE = 1000
+IMPORT_LOOKUP_CACHE_SIZE = 10000
+# Сколько строк выгрузка читает из базы за раз.
+EXPORT_CHUNK_SIZE = 2000
+
+# Загрузки пишутся на диск кусками, а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedTemporaryFileUploadHandler']
+# Предел размера картинки поста: файл в байтах и площадь в пикселях.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# Ширины вариантов картинки поста для srcset, в пикселях.
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Тесты пишут картинки во временный MEDIA_ROOT.
+TEST_RUNNER = 'core.test_runner.TempMediaTestRunner'
 
 ALLOWED_HOSTS = [
     'www.duckdanil.pythonanywhere.com',
@@ -137,8 +181,61 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Ленты сбрасываются сигналами при записи, поэтому живут долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Число постов ленты для пагинатора; поправляется при записи.
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+# Считать не больше стольких постов ленты и показывать "N+ страниц";
+# None - точный подсчет.
+POSTS_COUNT_ESTIMATE_LIMIT = None
+# Ключ карточки поста меняется при правке, поэтому храним ее сутки.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Доля запросов, замеряемых для лога yatube.timing: 0 - выключено,
+# 1 - каждый запрос. Заголовок Server-Timing из замера видят только
+# персонал и все при DEBUG.
+REQUEST_TIMING_SAMPLE_RATE = 0
+# Метрики запросов и кэша для /metrics/ (формат Prometheus).
+METRICS_ENABLED = True
+# Общий файл метрик и счетчика профилей всех процессов сайта и период
+# записи метрик в него, с.
+METRICS_DB = os.path.join(tempfile.gettempdir(), 'yatube-metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 10
+# Профилей ?__profile= в минуту на весь сайт, период сэмплирования, с,
+# и число строк таблицы cProfile.
+PROFILE_RATE_LIMIT = 6
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_STATS_LIMIT = 60
+# Запросы дольше стольких секунд пишутся в лог медленных запросов
+# с планом EXPLAIN для SELECT; None - выключено.
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_EXPLAIN = True
+# План одного запроса без значений берется не чаще раза за столько секунд.
+SLOW_QUERY_EXPLAIN_INTERVAL = 60 * 10
+# Общий файл лога медленных запросов всех процессов сайта. Его
+# ротирует logrotate: копии .1, .2.gz читает команда slowqueries.
+SLOW_QUERY_LOG = os.path.join(
+    tempfile.gettempdir(), 'yatube-slowqueries.log')
+# Сколько последних постов отдают RSS и Atom.
+FEED_ITEMS = 20
+# Списки админки считают не больше стольких строк.
+ADMIN_COUNT_LIMIT = 10000
+
+# Кэш страниц сбрасывается версиями в кэше, поэтому все процессы
+# сайта обязаны делить один кэш: с локальным кэшем другие воркеры
+# часами отдавали бы старые страницы и ETag. Счетчики постов (incr) и
+# защита от повторных задач (add) рассчитаны на атомарные операции
+# memcached; у файлового кэша они не атомарны. В разработке и тестах
+# процесс один и хватает LocMemCache.
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }
     }
-}